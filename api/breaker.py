@@ -0,0 +1,60 @@
+"""
+Latency-aware circuit breaker.
+
+Counts consecutive failed calls, where a call that overruns its
+deadline counts as failed too. After `failure_threshold` of them the
+breaker opens and callers skip the upstream entirely. Once
+`reset_timeout` has passed, one probe call is let through (half-open):
+if it succeeds the breaker closes, otherwise it opens again.
+"""
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Thread-safe breaker guarding one upstream dependency."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._changed_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            # Open: probe once the cool-down is over. Half-open: a probe is
+            # already out, but retry if it has hung for a whole cool-down.
+            if time.monotonic() - self._changed_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        self._state = state
+        self._changed_at = time.monotonic()
@@ -4,38 +4,327 @@ Supports both Supabase (production) and demo mode (local JSON).
 """
 import os
 import json
+import base64
+import bisect
+import heapq
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Callable, Hashable, Tuple
+
+from .breaker import CircuitBreaker
+from .metrics import instrument_db, instrument_db_iter, record_cache, record_stale
+from .profiling import profiled
+from .records import EventRecord
+from .related import RelatedIndex
+from .search import TermIndex, importance_boost
+from .singleflight import Group
+from .snapshot import SnapshotManager
 
 load_dotenv()
 
 # Check if we're in demo mode
 DEMO_MODE = not (os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY"))
 
+# Optional memory-mapped snapshot shared by all workers: the demo data,
+# or the fallback dataset when Supabase is slow or down
+SNAPSHOT_PATH = os.getenv("AIONOS_SNAPSHOT_PATH")
+_snapshots = SnapshotManager(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+
 # Supabase client singleton
 _supabase_client = None
 
-# Demo data cache
-_demo_events = None
+# Rows this recent are held back from /api/events/changes. updated_at is
+# the transaction start time, so a transaction committing after a reader
+# has moved past a later updated_at would otherwise be skipped for good
+SYNC_SAFETY_LAG = float(os.getenv("AIONOS_SYNC_LAG", "30"))
 
+# Supabase calls past this many seconds are answered from fallback data
+SUPABASE_DEADLINE = float(os.getenv("AIONOS_SUPABASE_DEADLINE", "2.0"))
+_breaker = CircuitBreaker(
+    "supabase",
+    failure_threshold=int(os.getenv("AIONOS_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("AIONOS_BREAKER_RESET", "30"))
+)
+# Runs the Supabase calls, so a caller can stop waiting at the deadline
+_supabase_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AIONOS_SUPABASE_THREADS", "16")),
+    thread_name_prefix="supabase"
+)
+# Last successful results of each operation per query, newest last. Each
+# operation has its own bound, so lookups by id can't evict the few list
+# and stats results that matter most while Supabase is down
+LAST_GOOD_SIZE = 64
+LAST_GOOD_SIZES = {
+    "get_event_by_id": 512,
+    "get_related_events": 512,
+    # Pages of a sync or export are retried by the client, never replayed
+    "get_changes": 0,
+    "iter_events": 0,
+}
+_last_good: Dict[str, OrderedDict] = {}
+_last_good_lock = threading.Lock()
+# Per-thread flag set when a call was answered from fallback data
+_call_state = threading.local()
 
-def _load_demo_events() -> List[Dict]:
-    """Load demo events from sources.py."""
-    global _demo_events
-    if _demo_events is None:
-        # Import the curated events from scraper sources
-        import sys
-        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        from scraper.sources import ESSENTIAL_EVENTS
+# Identical concurrent Supabase queries share one in-flight request
+_inflight_events = Group("get_all_events")
+_inflight_stats = Group("get_event_stats")
+_inflight_version = Group("get_dataset_version")
+
+# With Supabase, get_dataset_version() is reused for this many seconds
+# (and dropped when this process inserts), so page views don't each count the table
+DATASET_VERSION_TTL = float(os.getenv("AIONOS_VERSION_TTL", "5"))
+# (expires at, version)
+_dataset_version = None
+
+# Related-events index over the Supabase table, as (snapshot, index). With
+# a snapshot the index sits on the vectors its publisher stored there;
+# without one refresh_indexes builds it here (snapshot None). Either way
+# rows it has not seen yet are added to it
+_supabase_related = None
+_supabase_related_lock = threading.Lock()
+
+# Demo data store (events plus derived indexes), when there is no snapshot
+_demo_store = None
+_demo_store_lock = threading.Lock()
+# Change-feed epoch of demo data replaced in this process. Its versions
+# start over with the process, so its sync tokens must not match another's
+_PROCESS_EPOCH = time.time_ns()
+
+
+def _backend() -> str:
+    """Name of the active backend, used as a metrics label."""
+    return "demo" if DEMO_MODE else "supabase"
+
+
+def _rank_key(event: EventRecord):
+    """Sort key ranking events by importance, then chronologically."""
+    return (-event.importance, event.year, event.month or 0, event.day or 0, event.id)
+
+
+def _date_key(event: EventRecord):
+    """Sort key for timeline (year, month, day) order."""
+    return (event.year, event.month or 0, event.day or 0)
+
+
+class _DemoStore:
+    """
+    Demo events (as EventRecords) plus the indexes derived from them.
+    Replaced as a whole, so readers never see a half-built index.
+    """
+    
+    def __init__(self, events: List[EventRecord], version: int = 1, versions: Dict[int, int] = None,
+                 deleted: Dict[int, int] = None, epoch: int = _PROCESS_EPOCH):
+        self.events = events
+        # Versions are only comparable between stores of the same epoch
+        self.epoch = epoch
+        self.version = version
+        # Dataset version at which each event id was last inserted or changed
+        self.versions = versions if versions is not None else {e.id: version for e in events}
+        # Dataset version at which each removed event id disappeared
+        self.deleted = deleted or {}
+        self._lock = threading.Lock()
+        self._indexes = {}
+    
+    def _index(self, name: str, build):
+        """Return a derived index, building it on first use."""
+        index = self._indexes.get(name)
+        record_cache(name, index is not None)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._indexes[name] = build()
+        return index
+    
+    def warm(self):
+        """Build every derived index now, e.g. before the store is swapped in."""
+        for name in WARM_INDEXES:
+            getattr(self, name)
+    
+    @property
+    def by_id(self) -> Dict[int, EventRecord]:
+        """Events keyed by id."""
+        return self._index("by_id", lambda: {e.id: e for e in self.events})
+    
+    @property
+    def year_ranking(self) -> Dict[int, List[EventRecord]]:
+        """Events of each year, ranked by importance then date."""
+        def build():
+            ranking = {}
+            for event in self.events:
+                ranking.setdefault(event.year, []).append(event)
+            for year_events in ranking.values():
+                year_events.sort(key=_rank_key)
+            return ranking
+        return self._index("year_ranking", build)
+    
+    @property
+    def change_log(self) -> List[tuple]:
+        """(version, event_id, deleted) entries in ascending version order."""
+        def build():
+            log = [(v, event_id, False) for event_id, v in self.versions.items()]
+            log.extend((v, event_id, True) for event_id, v in self.deleted.items())
+            log.sort()
+            return log
+        return self._index("change_log", build)
+    
+    @property
+    def facet_bitmaps(self) -> Dict[str, Dict]:
+        """For each facet value, an int bitmap of the positions of events having it."""
+        def build():
+            positions = {facet: {} for facet in FACETS}
+            for i, e in enumerate(self.events):
+                positions["category"].setdefault(e.category, []).append(i)
+                positions["importance"].setdefault(e.importance, []).append(i)
+                positions["year"].setdefault(e.year, []).append(i)
+            size = len(self.events)
+            return {
+                facet: {value: _bitmap(p, size) for value, p in values.items()}
+                for facet, values in positions.items()
+            }
+        return self._index("facet_bitmaps", build)
+    
+    @property
+    def related_index(self) -> RelatedIndex:
+        """TF-IDF neighbor lists over titles and descriptions."""
+        return self._index("related_index", lambda: RelatedIndex(
+            (e.id, e.title, e.description) for e in self.events
+        ))
+    
+    @property
+    def term_index(self) -> TermIndex:
+        """BM25 term index over titles and descriptions, by event position."""
+        return self._index("term_index", lambda: TermIndex((e.title, e.description) for e in self.events))
+
+
+# Indexes built by _DemoStore.warm()
+WARM_INDEXES = ("by_id", "year_ranking", "change_log", "facet_bitmaps", "term_index", "related_index")
+
+# Facet dimensions returned by get_event_facets
+FACETS = ("category", "importance", "year")
+
+
+def _bitmap(positions, size: int) -> int:
+    """Int with bit i set for each position i."""
+    bits = bytearray((size + 7) // 8)
+    for i in positions:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _current_snapshot():
+    """The mapped snapshot, if AIONOS_SNAPSHOT_PATH points at one."""
+    return _snapshots.current() if _snapshots is not None else None
+
+
+def _get_demo_store() -> _DemoStore:
+    """
+    Load demo events from sources.py into the demo store. With a
+    snapshot, queries read it directly and never build this store.
+    """
+    global _demo_store
+    record_cache("demo_store", _demo_store is not None)
+    if _demo_store is None:
+        with _demo_store_lock:
+            if _demo_store is None:
+                # Import the curated events from scraper sources
+                import sys
+                sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                from scraper.sources import ESSENTIAL_EVENTS
+                
+                # Add mock IDs
+                events = [
+                    EventRecord.from_dict(event, id=i + 1)
+                    for i, event in enumerate(ESSENTIAL_EVENTS)
+                ]
+                # Every process loads the same curated events, so their tokens stay interchangeable
+                epoch = zlib.crc32(json.dumps(ESSENTIAL_EVENTS, sort_keys=True, default=str).encode())
+                _demo_store = _DemoStore(events, epoch=epoch)
+    
+    return _demo_store
+
+
+def _carry_related_index(old: _DemoStore, store: _DemoStore):
+    """When events were only added, extend old's related index into store instead of rebuilding it."""
+    related = old._indexes.get("related_index")
+    unchanged = all(store.versions.get(i) == v for i, v in old.versions.items())
+    if related is not None and unchanged:
+        old_by_id = old.by_id
+        related.add((e.id, e.title, e.description) for e in store.events if e.id not in old_by_id)
+        store._indexes["related_index"] = related
+
+
+def replace_demo_events(events: List[Dict], warm: bool = False) -> int:
+    """
+    Atomically swap the demo dataset and return its new version.
+    
+    Events without an id keep the id of the current event with the same
+    year and title, so unchanged events keep their version and only
+    real changes show up in get_changes(). With warm=True all indexes
+    are built before the swap, so no request pays for building them.
+    """
+    global _demo_store
+    with _demo_store_lock:
+        old = _demo_store or _DemoStore([], version=0)
+        store = _build_demo_store(events, old)
+        _carry_related_index(old, store)
+        if warm:
+            store.warm()
+        _demo_store = store
+        return store.version
+
+
+def _build_demo_store(events: List[Dict], old: _DemoStore) -> _DemoStore:
+    """The next store for events, with ids and versions carried over from old."""
+    version = old.version + 1
+    old_by_id = old.by_id if old.events else {}
+    old_ids = {(e.year, e.title.lower()): e.id for e in old.events}
+    next_id = max(old_by_id, default=0) + 1
+    
+    new_events = []
+    versions = {}
+    for event in events:
+        record = EventRecord.from_dict(event)
+        if record.id is None:
+            record.id = old_ids.get((record.year, record.title.lower()))
+            if record.id is None or record.id in versions:
+                record.id = next_id
+                next_id += 1
+        next_id = max(next_id, record.id + 1)
         
-        # Add mock IDs
-        _demo_events = []
-        for i, event in enumerate(ESSENTIAL_EVENTS):
-            event_copy = event.copy()
-            event_copy['id'] = i + 1
-            _demo_events.append(event_copy)
+        previous = old_by_id.get(record.id)
+        versions[record.id] = old.versions[record.id] if previous == record else version
+        new_events.append(record)
     
-    return _demo_events
+    deleted = {i: v for i, v in old.deleted.items() if i not in versions}
+    deleted.update({i: version for i in old_by_id if i not in versions})
+    return _DemoStore(new_events, version, versions, deleted)
+
+
+def assign_demo_ids(events: List[Dict]) -> List[Dict]:
+    """
+    Events with the ids replace_demo_events would give them, without
+    swapping them in; used to publish a snapshot with stable ids.
+    """
+    snapshot = _current_snapshot()
+    if snapshot is None:
+        old = _get_demo_store()
+    else:
+        # Only for this call: the ids come from the snapshot being replaced
+        old = _DemoStore([EventRecord.from_dict(row) for row in snapshot.rows()], snapshot.dataset_version,
+                         snapshot.versions(), snapshot.deleted())
+    return [e.to_dict() for e in _build_demo_store(events, old).events]
+
+
+def _load_demo_events() -> List[EventRecord]:
+    """Load demo events from sources.py."""
+    return _get_demo_store().events
 
 
 def get_supabase():
@@ -54,60 +343,234 @@ def get_supabase():
     return _supabase_client
 
 
+def _remember(cache_key: Tuple, result):
+    operation, key = cache_key
+    size = LAST_GOOD_SIZES.get(operation, LAST_GOOD_SIZE)
+    if size <= 0:
+        return
+    with _last_good_lock:
+        results = _last_good.setdefault(operation, OrderedDict())
+        results[key] = result
+        results.move_to_end(key)
+        if len(results) > size:
+            results.popitem(last=False)
+
+
+def _fetch_and_remember(cache_key: Tuple, fetch: Callable):
+    start = time.perf_counter()
+    try:
+        result = fetch()
+    except Exception:
+        if time.perf_counter() - start <= SUPABASE_DEADLINE:
+            _breaker.record_failure()
+        raise
+    # A late answer still refreshes the cache; the caller already counted the timeout
+    if time.perf_counter() - start <= SUPABASE_DEADLINE:
+        _breaker.record_success()
+    _remember(cache_key, result)
+    return result
+
+
+def _call_supabase(operation: str, key: Hashable, fetch: Callable, fallback: Callable = None) -> Tuple:
+    """
+    Run a Supabase query behind the circuit breaker and deadline.
+    
+    Returns (result, stale). When the breaker is open, the call fails or
+    it overruns SUPABASE_DEADLINE, the answer comes from the last good
+    result of the same query, else from fallback(snapshot) if a local
+    snapshot is configured. An overrunning call keeps going in the
+    background and refreshes the last good result when it completes.
+    With neither to answer from, the error is raised.
+    """
+    cache_key = (operation, key)
+    if _breaker.allow():
+        future = _supabase_executor.submit(profiled(_fetch_and_remember), cache_key, fetch)
+        try:
+            return future.result(timeout=SUPABASE_DEADLINE), False
+        except FutureTimeout:
+            _breaker.record_failure()
+            reason = "timeout"
+            error = TimeoutError(f"Supabase did not answer within {SUPABASE_DEADLINE:g}s")
+        except Exception as e:
+            reason, error = "error", e
+    else:
+        reason = "open"
+        error = ConnectionError("Supabase circuit breaker is open")
+    
+    with _last_good_lock:
+        results = _last_good.get(operation, {})
+        found = key in results
+        result = results.get(key)
+    if not found:
+        snapshot = _current_snapshot()
+        if fallback is None or snapshot is None:
+            raise error
+        result = fallback(snapshot)
+    record_stale(operation, reason)
+    return result, True
+
+
+def _mark_stale(stale: bool):
+    if stale:
+        _call_state.stale = True
+
+
+def call_tracking_staleness(func: Callable, *args, **kwargs) -> Tuple:
+    """
+    Call a database function and return (result, stale), where stale
+    says whether any part of it was answered from fallback data.
+    """
+    _call_state.stale = False
+    try:
+        return func(*args, **kwargs), _call_state.stale
+    finally:
+        _call_state.stale = False
+
+
+def _filter_demo_events(
+    events: List[EventRecord],
+    category: str = None,
+    importance: int = None,
+    year_from: int = None,
+    year_to: int = None,
+    search: str = None
+) -> List[EventRecord]:
+    """Apply the /api/events filters to demo events and sort them by date."""
+    if category:
+        events = [e for e in events if e.category == category]
+    if importance:
+        events = [e for e in events if e.importance >= importance]
+    if year_from:
+        events = [e for e in events if e.year >= year_from]
+    if year_to:
+        events = [e for e in events if e.year <= year_to]
+    if search:
+        search_lower = search.lower()
+        events = [e for e in events if 
+                 search_lower in e.title.lower() or 
+                 search_lower in (e.description or '').lower()]
+    
+    # Sort by year, month, day
+    return sorted(events, key=_date_key)
+
+
+def _or_filter(query, conditions: str):
+    """
+    Add a PostgREST `or=(...)` filter to a query builder.
+    Set directly because the pinned postgrest-py has no or_() method.
+    """
+    query.params = query.params.add("or", f"({conditions})")
+    return query
+
+
+def _apply_supabase_filters(
+    query,
+    category: str = None,
+    importance: int = None,
+    year_from: int = None,
+    year_to: int = None,
+    search: str = None
+):
+    """Apply the /api/events filters to a Supabase query builder."""
+    if category:
+        query = query.eq("category", category)
+    if importance:
+        query = query.gte("importance", importance)
+    if year_from:
+        query = query.gte("year", year_from)
+    if year_to:
+        query = query.lte("year", year_to)
+    if search:
+        query = _or_filter(query, f"title.ilike.%{search}%,description.ilike.%{search}%")
+    return query
+
+
+@instrument_db("get_all_events", _backend)
 def get_all_events(
     category: str = None,
     importance: int = None,
     year_from: int = None,
     year_to: int = None,
     search: str = None,
-    limit: int = 500
+    limit: int = 500,
+    rank: str = "date"
 ) -> List[Dict]:
     """
     Fetch events from database with optional filters.
     Falls back to demo data if Supabase not configured.
+    With rank="relevance" and a search, events matching any search term
+    come back best match first instead of in date order.
+    Concurrent identical Supabase queries are coalesced, so the returned
+    list may be shared with other callers and must not be mutated.
     """
+    ranked = rank == "relevance" and bool(search)
     if DEMO_MODE:
-        # Use demo data
-        events = _load_demo_events()
-        
-        # Apply filters
-        if category:
-            events = [e for e in events if e.get('category') == category]
-        if importance:
-            events = [e for e in events if e.get('importance', 3) >= importance]
-        if year_from:
-            events = [e for e in events if e.get('year', 0) >= year_from]
-        if year_to:
-            events = [e for e in events if e.get('year', 9999) <= year_to]
-        if search:
-            search_lower = search.lower()
-            events = [e for e in events if 
-                     search_lower in e.get('title', '').lower() or 
-                     search_lower in e.get('description', '').lower()]
+        snapshot = _current_snapshot()
+        if ranked and snapshot is not None:
+            return snapshot.search(search, limit, category, importance, year_from, year_to)
+        if ranked:
+            return _ranked_demo_events(_get_demo_store(), category, importance, year_from, year_to, search, limit)
+        if snapshot is not None:
+            return snapshot.query(
+                limit=limit, category=category, importance=importance,
+                year_from=year_from, year_to=year_to, search=search
+            )
         
-        # Sort by year, month, day
-        events = sorted(events, key=lambda x: (
-            x.get('year', 0), 
-            x.get('month', 0), 
-            x.get('day', 0)
-        ))
-        
-        return events[:limit]
+        # Use demo data
+        events = _filter_demo_events(
+            _load_demo_events(), category, importance, year_from, year_to, search
+        )
+        return [e.to_dict() for e in events[:limit]]
+    
+    # Use Supabase; ilike is case-insensitive, so the search case doesn't change the result
+    key = (category, importance, year_from, year_to, search.lower() if search else None, limit, ranked)
+    if ranked:
+        # The snapshot can't rank, so ranked queries only fall back to their last good result
+        fetch = lambda: _query_supabase_ranked(category, importance, year_from, year_to, search, limit)
+        fallback = None
+    else:
+        fetch = lambda: _query_supabase_events(category, importance, year_from, year_to, search, limit)
+        fallback = lambda snapshot: snapshot.query(
+            limit=limit, category=category, importance=importance,
+            year_from=year_from, year_to=year_to, search=search
+        )
+    events, stale = _inflight_events.do(key, lambda: _call_supabase("get_all_events", key, fetch, fallback))
+    _mark_stale(stale)
+    return events
+
+
+def _ranked_demo_events(store: _DemoStore, category, importance, year_from, year_to, search, limit) -> List[Dict]:
+    """Top `limit` events by BM25 score times importance boost."""
+    events = store.events
+    
+    def accept(i):
+        e = events[i]
+        return ((not category or e.category == category)
+                and (not importance or e.importance >= importance)
+                and (not year_from or e.year >= year_from)
+                and (not year_to or e.year <= year_to))
     
-    # Use Supabase
+    top = store.term_index.top_k(search, limit, weight=lambda i: importance_boost(events[i].importance),
+                                 accept=accept)
+    return [events[i].to_dict() for _, i in top]
+
+
+def _query_supabase_ranked(category, importance, year_from, year_to, search, limit) -> List[Dict]:
+    # Ranked with ts_rank_cd over a GIN index by the search_events function (see database_schema.sql)
+    return get_supabase().rpc("search_events", {
+        "p_query": search,
+        "p_category": category,
+        "p_importance": importance,
+        "p_year_from": year_from,
+        "p_year_to": year_to,
+        "p_limit": limit
+    }).execute().data
+
+
+def _query_supabase_events(category, importance, year_from, year_to, search, limit) -> List[Dict]:
     supabase = get_supabase()
     query = supabase.table("events").select("*")
-    
-    if category:
-        query = query.eq("category", category)
-    if importance:
-        query = query.gte("importance", importance)
-    if year_from:
-        query = query.gte("year", year_from)
-    if year_to:
-        query = query.lte("year", year_to)
-    if search:
-        query = query.or_(f"title.ilike.%{search}%,description.ilike.%{search}%")
+    query = _apply_supabase_filters(query, category, importance, year_from, year_to, search)
     
     query = query.order("year", desc=False).order("month", desc=False).order("day", desc=False)
     query = query.limit(limit)
@@ -116,44 +579,226 @@ def get_all_events(
     return result.data
 
 
+# Columns that define the export order; id breaks ties so the order is total
+EXPORT_SORT_COLUMNS = ("year", "month", "day", "id")
+NULLABLE_SORT_COLUMNS = ("month", "day")
+
+
+def _keyset_filter(last_row: Dict) -> str:
+    """
+    Build a PostgREST or-filter selecting rows strictly after last_row
+    in EXPORT_SORT_COLUMNS order. Ascending order puts NULLs last.
+    """
+    clauses = []
+    prefix = []
+    for column in EXPORT_SORT_COLUMNS:
+        value = last_row.get(column)
+        if value is None:
+            # Only other NULLs tie with a NULL; nothing sorts after them
+            prefix.append(f"{column}.is.null")
+            continue
+        conditions = [f"{column}.gt.{value}"]
+        if column in NULLABLE_SORT_COLUMNS:
+            conditions.append(f"{column}.is.null")
+        for condition in conditions:
+            parts = prefix + [condition]
+            clauses.append(parts[0] if len(parts) == 1 else f"and({','.join(parts)})")
+        prefix.append(f"{column}.eq.{value}")
+    return ",".join(clauses)
+
+
+@instrument_db_iter("iter_events", _backend)
+def iter_events(
+    category: str = None,
+    importance: int = None,
+    year_from: int = None,
+    year_to: int = None,
+    search: str = None,
+    page_size: int = 1000
+) -> Iterator[Dict]:
+    """
+    Yield every event matching the filters in date order, one page at a time.
+    Supabase is paged by keyset on (year, month, day, id), so each page
+    is an index range scan and memory stays bounded by page_size.
+    """
+    if DEMO_MODE:
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            yield from snapshot.iter_query(
+                category=category, importance=importance,
+                year_from=year_from, year_to=year_to, search=search
+            )
+            return
+        
+        events = _filter_demo_events(
+            _load_demo_events(), category, importance, year_from, year_to, search
+        )
+        for i in range(0, len(events), page_size):
+            yield from (e.to_dict() for e in events[i:i + page_size])
+        return
+    
+    supabase = get_supabase()
+    last_row = None
+    while True:
+        query = supabase.table("events").select("*")
+        query = _apply_supabase_filters(query, category, importance, year_from, year_to, search)
+        if last_row is not None:
+            query = _or_filter(query, _keyset_filter(last_row))
+        for column in EXPORT_SORT_COLUMNS:
+            query = query.order(column, desc=False)
+        rows, _ = _call_supabase("iter_events", None, lambda: query.limit(page_size).execute().data)
+        
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_row = rows[-1]
+
+
+@instrument_db("get_event_facets", _backend)
+def get_event_facets(
+    category: str = None,
+    importance: int = None,
+    year_from: int = None,
+    year_to: int = None,
+    search: str = None,
+    rank: str = "date"
+) -> Dict[str, Dict]:
+    """
+    Counts per category, importance level and year for a filtered query.
+    
+    Each facet is counted under all active filters except its own, so
+    the counts show what selecting another value of it would return.
+    Values with no matching events are left out. With rank="relevance"
+    the search matches events containing any search term, like the
+    ranked get_all_events query.
+    """
+    any_term = rank == "relevance" and bool(search)
+    if DEMO_MODE:
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            return snapshot.facets(category, importance, year_from, year_to, search, any_term)
+        return _demo_facets(_get_demo_store(), category, importance, year_from, year_to, search, any_term)
+    
+    # Aggregated in SQL by the event_facets function (see database_schema.sql)
+    def fetch():
+        rows = get_supabase().rpc("event_facets", {
+            "p_category": category,
+            "p_importance": importance,
+            "p_year_from": year_from,
+            "p_year_to": year_to,
+            "p_search": search,
+            "p_any_term": any_term
+        }).execute().data
+        facets = {facet: {} for facet in FACETS}
+        for row in rows:
+            value = row["value"] if row["facet"] == "category" else int(row["value"])
+            facets[row["facet"]][value] = row["total"]
+        return {facet: dict(sorted(counts.items())) for facet, counts in facets.items()}
+    
+    key = (category, importance, year_from, year_to, search.lower() if search else None, any_term)
+    facets, stale = _call_supabase(
+        "get_event_facets", key, fetch,
+        lambda snapshot: snapshot.facets(category, importance, year_from, year_to, search, any_term)
+    )
+    _mark_stale(stale)
+    return facets
+
+
+def _demo_facets(store: _DemoStore, category, importance, year_from, year_to, search,
+                 any_term: bool = False) -> Dict[str, Dict]:
+    """Facet counts from AND-ed bitmaps: one popcount per facet value."""
+    bitmaps = store.facet_bitmaps
+    everything = (1 << len(store.events)) - 1
+    masks = {facet: everything for facet in FACETS}
+    if category:
+        masks["category"] = bitmaps["category"].get(category, 0)
+    if importance:
+        masks["importance"] = 0
+        for level, bitmap in bitmaps["importance"].items():
+            if level >= importance:
+                masks["importance"] |= bitmap
+    if year_from or year_to:
+        masks["year"] = 0
+        for year, bitmap in bitmaps["year"].items():
+            if (not year_from or year >= year_from) and (not year_to or year <= year_to):
+                masks["year"] |= bitmap
+    
+    # Search applies to every facet
+    base = everything
+    if search and any_term:
+        base = _bitmap(store.term_index.matches(search), len(store.events))
+    elif search:
+        needle = search.lower()
+        base = _bitmap(
+            (i for i, e in enumerate(store.events)
+             if needle in e.title.lower() or needle in (e.description or "").lower()),
+            len(store.events)
+        )
+    
+    facets = {}
+    for facet in FACETS:
+        others = base
+        for other in FACETS:
+            if other != facet:
+                others &= masks[other]
+        counts = {value: (bitmap & others).bit_count() for value, bitmap in bitmaps[facet].items()}
+        facets[facet] = {value: n for value, n in sorted(counts.items()) if n}
+    return facets
+
+
+@instrument_db("get_event_by_id", _backend)
 def get_event_by_id(event_id: int) -> Optional[Dict]:
     """Fetch a single event by ID."""
     if DEMO_MODE:
-        events = _load_demo_events()
-        for event in events:
-            if event.get('id') == event_id:
-                return event
-        return None
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            return snapshot.get(event_id)
+        event = _get_demo_store().by_id.get(event_id)
+        return event.to_dict() if event else None
     
-    supabase = get_supabase()
-    result = supabase.table("events").select("*").eq("id", event_id).single().execute()
-    return result.data
+    def fetch():
+        # limit(1) rather than single(), so a missing id is None, not an upstream failure
+        supabase = get_supabase()
+        rows = supabase.table("events").select("*").eq("id", event_id).limit(1).execute().data
+        return rows[0] if rows else None
+    
+    event, stale = _call_supabase("get_event_by_id", event_id, fetch, lambda snapshot: snapshot.get(event_id))
+    _mark_stale(stale)
+    return event
 
 
+@instrument_db("get_event_stats", _backend)
 def get_event_stats() -> Dict:
     """Get statistics about events for charts."""
     if DEMO_MODE:
-        events = _load_demo_events()
-    else:
-        supabase = get_supabase()
-        result = supabase.table("events").select("year, category, importance").execute()
-        events = result.data
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            return snapshot.stats()
+        return _aggregate_stats([(e.year, e.category) for e in _load_demo_events()])
     
+    stats, stale = _inflight_stats.do("stats", lambda: _call_supabase(
+        "get_event_stats", None,
+        lambda: _aggregate_stats(_query_supabase_stat_pairs()),
+        lambda snapshot: snapshot.stats()
+    ))
+    _mark_stale(stale)
+    return stats
+
+
+def _aggregate_stats(pairs: List[tuple]) -> Dict:
+    """Chart statistics from (year, category) pairs."""
     # Aggregate by year
     years = {}
     categories = {}
     
-    for event in events:
-        year = event.get("year")
-        category = event.get("category")
-        
+    for year, category in pairs:
         if year:
             years[year] = years.get(year, 0) + 1
         if category:
             categories[category] = categories.get(category, 0) + 1
     
     return {
-        "total_events": len(events),
+        "total_events": len(pairs),
         "events_by_year": dict(sorted(years.items())),
         "events_by_category": categories,
         "year_range": {
@@ -163,6 +808,316 @@ def get_event_stats() -> Dict:
     }
 
 
+def _query_supabase_stat_pairs() -> List[tuple]:
+    supabase = get_supabase()
+    result = supabase.table("events").select("year, category, importance").execute()
+    return [(e.get("year"), e.get("category")) for e in result.data]
+
+
+@instrument_db("get_timeline", _backend)
+def get_timeline(
+    year_from: int = 1950,
+    year_to: int = 2030,
+    buckets: int = 20,
+    per_bucket: int = 3
+) -> Dict:
+    """
+    Level-of-detail timeline for a viewport.
+    
+    Splits [year_from, year_to] into at most `buckets` equal year ranges
+    and returns the `per_bucket` most important events of each range,
+    plus how many events stay hidden. Empty buckets are omitted.
+    """
+    width = max(1, -(-(year_to - year_from + 1) // buckets))
+    result = {"year_from": year_from, "year_to": year_to, "bucket_years": width, "buckets": []}
+    
+    if DEMO_MODE:
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            result["buckets"] = snapshot.timeline(year_from, year_to, width, per_bucket)
+            return result
+        ranking = _get_demo_store().year_ranking
+        for start in range(year_from, year_to + 1, width):
+            end = min(start + width - 1, year_to)
+            # Each year list is already ranked, so only its head can make the top-k
+            heads = [ranking[y][:per_bucket] for y in range(start, end + 1) if y in ranking]
+            total = sum(len(ranking[y]) for y in range(start, end + 1) if y in ranking)
+            if not total:
+                continue
+            top = list(heapq.merge(*heads, key=_rank_key))[:per_bucket]
+            result["buckets"].append({
+                "start": start,
+                "end": end,
+                "events": [e.to_dict() for e in top],
+                "total": total,
+                "hidden": total - len(top)
+            })
+        return result
+    
+    # Ranking is done in SQL by the timeline_buckets function (see database_schema.sql)
+    def fetch():
+        return get_supabase().rpc("timeline_buckets", {
+            "p_year_from": year_from,
+            "p_year_to": year_to,
+            "p_width": width,
+            "p_k": per_bucket
+        }).execute().data
+    
+    # No snapshot fallback: the snapshot has no ranking index, only last good results
+    rows, stale = _call_supabase("get_timeline", (year_from, year_to, width, per_bucket), fetch)
+    _mark_stale(stale)
+    by_start = {}
+    for row in rows:
+        start = row["bucket_start"]
+        bucket = by_start.get(start)
+        if bucket is None:
+            bucket = {
+                "start": start,
+                "end": min(start + width - 1, year_to),
+                "events": [],
+                "total": row["bucket_total"],
+                "hidden": row["bucket_total"]
+            }
+            by_start[start] = bucket
+            result["buckets"].append(bucket)
+        bucket["events"].append(row["event"])
+        bucket["hidden"] -= 1
+    return result
+
+
+def warm_indexes():
+    """
+    Build the in-memory indexes now (e.g. at startup) so no request has
+    to. A snapshot's indexes are built by whoever writes it, so with one
+    configured there is nothing to build here.
+    """
+    if DEMO_MODE:
+        if _current_snapshot() is None:
+            _get_demo_store().warm()
+    elif _snapshots is None:
+        refresh_indexes()
+
+
+def refresh_indexes():
+    """
+    Pick up new derived data off the request path: map a republished
+    snapshot now rather than on the next check, or without one rebuild
+    the Supabase related-events index.
+    """
+    global _supabase_related
+    if _snapshots is not None:
+        _snapshots.current(force=True)
+        return
+    if DEMO_MODE:
+        return
+    related = RelatedIndex((e["id"], e["title"], e.get("description")) for e in iter_events())
+    _supabase_related = (None, related)
+
+
+def _related_index() -> Optional[RelatedIndex]:
+    """The Supabase related index (see _supabase_related); None until it is built or published."""
+    global _supabase_related
+    current = _supabase_related
+    snapshot = _current_snapshot()
+    if snapshot is None:
+        return current[1] if current is not None else None
+    if current is None or current[0] is not snapshot:
+        with _supabase_related_lock:
+            current = _supabase_related
+            if current is None or current[0] is not snapshot:
+                # Rows added to the previous one are in the new snapshot or get added again
+                current = _supabase_related = (snapshot, snapshot.related_index())
+    return current[1]
+
+
+def _index_rows(related: RelatedIndex, rows: List[Dict]):
+    """Add rows the related index doesn't know yet, e.g. inserted by another worker."""
+    with _supabase_related_lock:
+        rows = [row for row in rows if related.related(row["id"]) is None]
+        related.add((row["id"], row["title"], row.get("description")) for row in rows)
+
+
+@instrument_db("get_related_events", _backend)
+def get_related_events(event_id: int, limit: int = 5) -> Optional[List[Dict]]:
+    """
+    Events most similar to an event by title and description (TF-IDF
+    cosine), most similar first, each with a `similarity` score.
+    Returns None if the event doesn't exist.
+    
+    With Supabase, an event missing from the index is vectorized and
+    added on the spot. Until the index has been built (or with a
+    snapshot, published), existing events get an empty (stale) list
+    rather than waiting for it.
+    """
+    if DEMO_MODE:
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            # Neighbor lists were computed when the snapshot was written
+            neighbors = snapshot.related(event_id, limit)
+            if neighbors is None:
+                return None
+            return [dict(snapshot.get(i), similarity=score) for i, score in neighbors]
+        store = _get_demo_store()
+        neighbors = store.related_index.related(event_id, limit)
+        if neighbors is None:
+            return None
+        by_id = store.by_id
+        return [dict(by_id[i].to_dict(), similarity=score) for i, score in neighbors if i in by_id]
+    
+    related = _related_index()
+    neighbors = related.related(event_id, limit) if related is not None else None
+    if neighbors is None:
+        event = get_event_by_id(event_id)
+        if event is None:
+            return None
+        if related is None:
+            _mark_stale(True)
+            return []
+        _index_rows(related, [event])
+        neighbors = related.related(event_id, limit)
+    if not neighbors:
+        return []
+    ids = [i for i, _ in neighbors]
+    
+    def fetch():
+        return get_supabase().table("events").select("*").in_("id", ids).execute().data
+    
+    rows, stale = _call_supabase("get_related_events", tuple(ids), fetch)
+    _mark_stale(stale)
+    by_id = {row["id"]: row for row in rows}
+    return [dict(by_id[i], similarity=score) for i, score in neighbors if i in by_id]
+
+
+def _encode_token(payload: Dict) -> str:
+    """Encode a sync position as an opaque URL-safe token."""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_token(token: str) -> Dict:
+    """Decode a token from _encode_token, raising ValueError if invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid sync token")
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid sync token")
+    return payload
+
+
+@instrument_db("get_changes", _backend)
+def get_changes(since: str = None, limit: int = 500) -> Dict:
+    """
+    Get events inserted or updated after a sync token.
+    
+    Without a token every event is returned (initial sync). Pass the
+    returned `next` token to the following call; `has_more` says whether
+    another page is already waiting. Cost is proportional to the number
+    of changed rows, not the table size.
+    
+    With Supabase, rows changed in the last SYNC_SAFETY_LAG seconds are
+    only returned once they are older, so transactions still in flight
+    when a page is read cannot be skipped.
+    
+    Demo tokens carry the epoch of the data's versions. A token from
+    before they started over (a restart without a snapshot, or a
+    snapshot written from scratch) raises ValueError, so the client
+    knows to sync again from the start.
+    """
+    if DEMO_MODE:
+        snapshot = _current_snapshot()
+        store = _get_demo_store() if snapshot is None else None
+        epoch = (snapshot or store).epoch
+        position = _decode_token(since) if since else {"e": epoch, "v": 0, "p": 0}
+        since_version, last_id = position.get("v"), position.get("p")
+        if not isinstance(since_version, int) or not isinstance(last_id, int):
+            raise ValueError("Invalid sync token")
+        if position.get("e") != epoch:
+            raise ValueError("Sync token is from data that has since been reset; sync again without since")
+        
+        # The log is sorted by (version, id), so resuming is one bisect
+        if snapshot is not None:
+            page, has_more = snapshot.changes(since_version, last_id, limit)
+            events = [snapshot.get(i) for _, i, gone in page if not gone]
+        else:
+            log = store.change_log
+            start = bisect.bisect_right(log, (since_version, last_id, True))
+            page, has_more = log[start:start + limit], start + limit < len(log)
+            events = [store.by_id[i].to_dict() for _, i, gone in page if not gone]
+        
+        deleted = [i for _, i, gone in page if gone]
+        next_token = _encode_token({"e": epoch, "v": page[-1][0], "p": page[-1][1]}) if page else since
+        return {
+            "events": events,
+            "deleted": deleted,
+            "next": next_token or _encode_token(position),
+            "has_more": has_more
+        }
+    
+    supabase = get_supabase()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SYNC_SAFETY_LAG)
+    query = supabase.table("events").select("*").lt("updated_at", cutoff.isoformat())
+    if since:
+        position = _decode_token(since)
+        updated_at, last_id = position.get("t"), position.get("id", 0)
+        if not isinstance(updated_at, str) or not isinstance(last_id, int):
+            raise ValueError("Invalid sync token")
+        # Keyset on (updated_at, id), served by idx_events_updated_at
+        query = _or_filter(
+            query,
+            f'updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt.{last_id})'
+        )
+    query = query.order("updated_at", desc=False).order("id", desc=False).limit(limit)
+    rows, _ = _call_supabase("get_changes", None, lambda: query.execute().data)
+    
+    if rows:
+        next_token = _encode_token({"t": rows[-1]["updated_at"], "id": rows[-1]["id"]})
+    else:
+        next_token = since or _encode_token({"t": "-infinity", "id": 0})
+    # Deletes are not tracked in the events table, so deleted is always empty here
+    return {"events": rows, "deleted": [], "next": next_token, "has_more": len(rows) == limit}
+
+
+@instrument_db("get_dataset_version", _backend)
+def get_dataset_version() -> str:
+    """
+    An identifier that changes whenever the events do, for caching
+    whole renderings of the data (see api/render.py).
+    
+    With Supabase it may lag writes from other processes by up to
+    DATASET_VERSION_TTL seconds.
+    """
+    global _dataset_version
+    if DEMO_MODE:
+        snapshot = _current_snapshot()
+        if snapshot is not None:
+            # Demo queries read the snapshot itself, so its identity versions them
+            return f"snapshot-{snapshot.dataset_version}-{snapshot.created_at:.0f}"
+        return f"demo-{_get_demo_store().version}"
+    
+    cached = _dataset_version
+    record_cache("dataset_version", cached is not None and time.monotonic() < cached[0])
+    if cached is not None and time.monotonic() < cached[0]:
+        return cached[1]
+    
+    def fetch():
+        # Row count catches deletes, the latest (updated_at, id) inserts and updates
+        result = (
+            get_supabase().table("events").select("id,updated_at", count="exact")
+            .order("updated_at", desc=True).order("id", desc=True).limit(1).execute()
+        )
+        latest = result.data[0] if result.data else {}
+        return f"{result.count}-{latest.get('updated_at')}-{latest.get('id')}"
+    
+    version, stale = _inflight_version.do(None, lambda: _call_supabase("get_dataset_version", None, fetch))
+    _mark_stale(stale)
+    if not stale:
+        _dataset_version = (time.monotonic() + DATASET_VERSION_TTL, version)
+    return version
+
+
+@instrument_db("insert_event", _backend)
 def insert_event(event_data: dict):
     """Insert a new event."""
     if DEMO_MODE:
@@ -170,9 +1125,11 @@ def insert_event(event_data: dict):
     
     supabase = get_supabase()
     result = supabase.table("events").insert(event_data).execute()
+    _after_insert(result.data)
     return result.data
 
 
+@instrument_db("insert_events_batch", _backend)
 def insert_events_batch(events: list):
     """Insert multiple events at once."""
     if DEMO_MODE:
@@ -180,9 +1137,19 @@ def insert_events_batch(events: list):
     
     supabase = get_supabase()
     result = supabase.table("events").insert(events).execute()
+    _after_insert(result.data)
     return result.data
 
 
+def _after_insert(rows: List[Dict]):
+    """Show inserted rows at once: new dataset version, and added to the related index if built."""
+    global _dataset_version
+    _dataset_version = None
+    related = _related_index()
+    if related is not None and rows:
+        _index_rows(related, rows)
+
+
 def is_demo_mode() -> bool:
     """Check if running in demo mode."""
     return DEMO_MODE
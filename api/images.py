@@ -0,0 +1,363 @@
+"""
+Event image thumbnails.
+
+Originals referenced by `image_url` are fetched, resized to the
+nearest of a few fixed widths and re-encoded as WebP, so clients never
+hot-link full-size images. Thumbnails live in a disk cache whose file
+names are the hash of (original's bytes, width, quality), and the name
+doubles as the ETag, so a replaced image gets a new one even at the
+same URL. Per URL, the cache also records the digest of the original
+and its validators (ETag / Last-Modified); once that record is older
+than AIONOS_IMAGE_REVALIDATE the original is re-checked with a
+conditional request. The cache is bounded in bytes and evicts least
+recently used files.
+
+Where originals come from is pluggable: HttpOrigin downloads them,
+FileOrigin (AIONOS_IMAGE_ROOT) reads them from a local directory, e.g.
+for tests or self-hosted images. HttpOrigin only connects to public
+addresses (optionally only to AIONOS_IMAGE_HOSTS) and doesn't follow
+redirects, so image_url can't be used to reach internal services. It
+connects to the very address it checked, so a host whose DNS answer
+changes in between (DNS rebinding) can't slip past the check.
+"""
+import hashlib
+import io
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+from PIL import Image, ImageOps
+
+from .metrics import record_cache
+from .singleflight import Group
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+THUMBNAIL_WIDTHS = (160, 320, 640, 1280)
+WEBP_QUALITY = 80
+IMAGE_CACHE_DIR = os.getenv("AIONOS_IMAGE_CACHE_DIR", os.path.join(BASE_DIR, "data", "images"))
+IMAGE_CACHE_BYTES = int(float(os.getenv("AIONOS_IMAGE_CACHE_MB", "256")) * 1024 * 1024)
+IMAGE_ROOT = os.getenv("AIONOS_IMAGE_ROOT")
+# Hosts originals may be downloaded from ("example.org", or ".example.org"
+# for it and its subdomains); any public host when unset
+IMAGE_HOSTS = [h.strip().lower() for h in os.getenv("AIONOS_IMAGE_HOSTS", "").split(",") if h.strip()]
+# Seconds a recorded original is trusted before it is checked for changes
+REVALIDATE_AFTER = float(os.getenv("AIONOS_IMAGE_REVALIDATE", "86400"))
+# Originals larger than this are refused, before and after download
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+FETCH_TIMEOUT = 10
+# Decompression-bomb guard for what Pillow will decode
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+
+class ImageError(Exception):
+    """An original could not be fetched or decoded."""
+
+
+def _host_allowed(host: str, allowed: List[str]) -> bool:
+    if not allowed:
+        return True
+    return any(host == entry or (entry.startswith(".") and (host == entry[1:] or host.endswith(entry)))
+               for entry in allowed)
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class HttpOrigin:
+    """
+    Downloads originals over http(s), refusing oversized ones, hosts that
+    resolve to any non-public address, hosts outside `allowed_hosts` (if
+    given) and redirects.
+
+    fetch() takes the validators of a copy already seen and returns
+    (None, validators) when the origin says it is unchanged.
+    """
+
+    def __init__(self, allowed_hosts: List[str] = None):
+        self.allowed_hosts = allowed_hosts or []
+
+    def check_url(self, url: str) -> str:
+        """Raise ImageError unless url may be fetched; otherwise the address to connect to."""
+        parts = urlparse(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ImageError(f"Unsupported image URL: {url}")
+        host = parts.hostname.lower()
+        if not _host_allowed(host, self.allowed_hosts):
+            raise ImageError(f"Image host not allowed: {host}")
+        try:
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            # In the resolver's order of preference
+            addresses = list(dict.fromkeys(
+                info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+            ))
+        except (socket.gaierror, ValueError) as e:
+            raise ImageError(f"Cannot resolve image host {host}: {e}")
+        if not all(_is_public(address) for address in addresses):
+            raise ImageError(f"Image host {host} is not a public address")
+        return addresses[0]
+
+    def _pool(self, url: str) -> urllib3.HTTPConnectionPool:
+        """
+        A connection pool for url's checked address rather than its host
+        name, so nothing resolves the name again. TLS still sends the host
+        name (SNI) and verifies the certificate against it.
+        """
+        address = self.check_url(url)
+        parts = urlparse(url)
+        if parts.scheme == "https":
+            host = parts.hostname
+            return urllib3.HTTPSConnectionPool(
+                address, parts.port or 443, timeout=FETCH_TIMEOUT, retries=False,
+                server_hostname=host, assert_hostname=host,
+                cert_reqs="CERT_REQUIRED", ca_certs=requests.certs.where()
+            )
+        return urllib3.HTTPConnectionPool(address, parts.port or 80, timeout=FETCH_TIMEOUT, retries=False)
+
+    def fetch(self, url: str, validators: Dict = None) -> Tuple[Optional[bytes], Dict]:
+        pool = self._pool(url)
+        parts = urlparse(url)
+        headers = {"Host": parts.netloc.rsplit("@", 1)[-1]}
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        try:
+            response = pool.urlopen("GET", target, headers=headers, redirect=False,
+                                    preload_content=False, assert_same_host=False)
+            try:
+                if response.status == 304 and validators:
+                    return None, validators
+                if response.get_redirect_location():
+                    raise ImageError("Image URL redirects; link the final URL instead")
+                if response.status >= 400:
+                    raise ImageError(f"Error fetching {url}: HTTP {response.status}")
+                if int(response.headers.get("Content-Length") or 0) > MAX_SOURCE_BYTES:
+                    raise ImageError("Image too large")
+                data = bytearray()
+                for chunk in response.stream(64 * 1024, decode_content=True):
+                    data.extend(chunk)
+                    if len(data) > MAX_SOURCE_BYTES:
+                        raise ImageError("Image too large")
+                validators = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                return bytes(data), validators
+            finally:
+                response.release_conn()
+        except urllib3.exceptions.HTTPError as e:
+            raise ImageError(f"Error fetching {url}: {e}")
+        finally:
+            pool.close()
+
+
+class FileOrigin:
+    """Reads originals from a local directory; URLs are paths below it."""
+
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root)
+
+    def fetch(self, url: str, validators: Dict = None) -> Tuple[Optional[bytes], Dict]:
+        path = os.path.realpath(os.path.join(self.root, urlparse(url).path.lstrip("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ImageError(f"Image outside the image root: {url}")
+        try:
+            stat = os.stat(path)
+            current = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            if current == validators:
+                return None, validators
+            if stat.st_size > MAX_SOURCE_BYTES:
+                raise ImageError("Image too large")
+            with open(path, "rb") as f:
+                return f.read(), current
+        except OSError as e:
+            raise ImageError(f"Error reading {url}: {e.strerror}")
+
+
+class DiskCache:
+    """
+    Size-bounded LRU of files in one directory.
+
+    Recency is kept in memory and mirrored in file mtimes, so the order
+    survives restarts. Several workers may share the directory; a file
+    evicted by another process is just a miss here.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.size += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self._entries.pop(name, 0)
+            return None
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = len(data)
+                self.size += len(data)
+            self._entries.move_to_end(name)
+        try:
+            os.utime(self._path(name))
+        except OSError:
+            pass
+        return data
+
+    def put(self, name: str, data: bytes):
+        # Written aside and renamed, so readers never see a partial file
+        temp = self._path(f".{name}.{os.getpid()}.{threading.get_ident()}")
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, self._path(name))
+        with self._lock:
+            self.size += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+
+def pick_width(requested: int) -> int:
+    """The smallest fixed width covering the request (the largest if none does)."""
+    for width in THUMBNAIL_WIDTHS:
+        if width >= requested:
+            return width
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def resize(data: bytes, width: int, quality: int = WEBP_QUALITY) -> bytes:
+    """Scale an image down to `width` (never up) and encode it as WebP."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEGs can be decoded at a reduced scale, far cheaper than full size
+            image.draft("RGB", (width, max(1, width * image.height // max(image.width, 1))))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, "WEBP", quality=quality, method=4)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Cannot decode image: {e}")
+
+
+class ThumbnailService:
+    """Serves thumbnails from the disk cache, making them on a miss."""
+
+    def __init__(self, origin, cache: DiskCache, quality: int = WEBP_QUALITY,
+                 revalidate_after: float = REVALIDATE_AFTER):
+        self.origin = origin
+        self.cache = cache
+        self.quality = quality
+        self.revalidate_after = revalidate_after
+        # Concurrent misses for one thumbnail fetch and resize it once
+        self._inflight = Group("thumbnail")
+
+    def key(self, digest: str, width: int) -> str:
+        """Cache key (and ETag) of the thumbnail, at the width covering `width`, of the original with digest."""
+        rendering = f"{digest}\n{pick_width(width)}\n{self.quality}"
+        return hashlib.sha256(rendering.encode()).hexdigest()[:32]
+
+    def _record_name(self, url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()[:32] + ".json"
+
+    def _record(self, url: str) -> Optional[Dict]:
+        """What was last seen at url: digest, validators and when it was checked."""
+        data = self.cache.get(self._record_name(url))
+        return json.loads(data) if data is not None else None
+
+    def cached_key(self, url: str, width: int) -> Optional[str]:
+        """The thumbnail's key if url's original was checked recently, without fetching anything."""
+        record = self._record(url)
+        if record is None or time.time() - record["checked"] >= self.revalidate_after:
+            return None
+        return self.key(record["digest"], width)
+
+    def thumbnail(self, url: str, width: int) -> Tuple[str, bytes]:
+        """(key, WebP bytes) for `url` at the fixed width covering `width`."""
+        key = self.cached_key(url, width)
+        data = self.cache.get(f"{key}.webp") if key is not None else None
+        record_cache("thumbnail", data is not None)
+        if data is None:
+            width = pick_width(width)
+            key, data = self._inflight.do((url, width), lambda: self._make(url, width))
+        return key, data
+
+    def _make(self, url: str, width: int) -> Tuple[str, bytes]:
+        record = self._record(url)
+        cached = None
+        if record is not None:
+            cached = self.cache.get(f"{self.key(record['digest'], width)}.webp")
+        # A conditional request only helps when there is a thumbnail to keep
+        original, validators = self.origin.fetch(url, record["validators"] if cached is not None else None)
+        if original is None:
+            digest, data = record["digest"], cached
+        else:
+            digest = hashlib.sha256(original).hexdigest()
+            name = f"{self.key(digest, width)}.webp"
+            data = self.cache.get(name)
+            if data is None:
+                data = resize(original, width, self.quality)
+                self.cache.put(name, data)
+        record = {"digest": digest, "validators": validators, "checked": time.time()}
+        self.cache.put(self._record_name(url), json.dumps(record).encode())
+        return self.key(digest, width), data
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> ThumbnailService:
+    """The process-wide service, created on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                origin = FileOrigin(IMAGE_ROOT) if IMAGE_ROOT else HttpOrigin(IMAGE_HOSTS)
+                _service = ThumbnailService(origin, DiskCache(IMAGE_CACHE_DIR, IMAGE_CACHE_BYTES))
+    return _service
@@ -0,0 +1,158 @@
+"""
+Streaming NDJSON ingest for POST /api/events/bulk.
+
+The body is read chunk by chunk and split into lines; every
+BULK_BATCH_SIZE lines are decoded, validated against EventCreate in
+one call of a list validator, and the valid ones written as one
+insert. Only one batch is held at a time and the next chunk is not
+read before the write is done, so memory stays flat whatever the
+upload size. Bad lines are reported by line number and skipped; they
+never reject the rest of the upload.
+
+The endpoint writes to the database, so it is off unless
+AIONOS_INGEST_TOKEN is set, and then requires that token as a bearer
+token.
+"""
+import hmac
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from .models import EventCreate
+from .profiling import run_in_threadpool
+
+INGEST_TOKEN = os.getenv("AIONOS_INGEST_TOKEN")
+
+BULK_BATCH_SIZE = 500
+# Longer lines are rejected without being buffered
+MAX_LINE_BYTES = 64 * 1024
+# Errors listed in the response; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+_events_adapter = TypeAdapter(List[EventCreate])
+
+
+def is_enabled() -> bool:
+    return bool(INGEST_TOKEN)
+
+
+def is_authorized(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries the ingest token."""
+    if not INGEST_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), INGEST_TOKEN.encode())
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """(line number, line) for each non-blank line; oversized lines come back as None."""
+    buffer = b""
+    number = 0
+    skipping = False
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            number += 1
+            if skipping:
+                skipping = False
+            elif len(line) > MAX_LINE_BYTES:
+                yield number, None
+            elif line.strip():
+                yield number, line
+        if len(buffer) > MAX_LINE_BYTES:
+            # Report the line once and drop the rest of it as it arrives
+            if not skipping:
+                yield number + 1, None
+                skipping = True
+            buffer = b""
+    if buffer.strip() and not skipping:
+        yield number + 1, buffer if len(buffer) <= MAX_LINE_BYTES else None
+
+
+def _format_error(error: Dict) -> str:
+    field = ".".join(str(part) for part in error["loc"][1:])
+    return f"{field}: {error['msg']}" if field else error["msg"]
+
+
+def validate_batch(lines: List[Tuple[int, bytes]]) -> Tuple[List[Tuple[int, Dict]], List[Tuple[int, str]]]:
+    """
+    Decode and validate a batch of lines.
+
+    Returns (line, event dict) for valid records and (line, message) for
+    the rest. A batch with errors is validated a second time without
+    them, which only costs extra on batches that had bad lines.
+    """
+    errors = []
+    numbers, records = [], []
+    for number, line in lines:
+        if line is None:
+            errors.append((number, f"Line longer than {MAX_LINE_BYTES} bytes"))
+            continue
+        try:
+            records.append(json.loads(line))
+            numbers.append(number)
+        except ValueError as e:
+            errors.append((number, f"Invalid JSON: {e}"))
+
+    try:
+        events = _events_adapter.validate_python(records)
+    except ValidationError as e:
+        messages = {}
+        for error in e.errors():
+            messages.setdefault(error["loc"][0], []).append(_format_error(error))
+        errors.extend((numbers[index], "; ".join(found)) for index, found in messages.items())
+        numbers = [number for index, number in enumerate(numbers) if index not in messages]
+        events = _events_adapter.validate_python(
+            [record for index, record in enumerate(records) if index not in messages]
+        )
+
+    valid = list(zip(numbers, _events_adapter.dump_python(events, mode="json")))
+    errors.sort()
+    return valid, errors
+
+
+async def ingest(chunks: AsyncIterator[bytes], write: Callable[[List[Dict]], Awaitable]) -> Dict:
+    """
+    Validate an NDJSON stream and pass valid events to `write` a batch
+    at a time. A failed write fails that batch's lines and ends the upload.
+    """
+    summary = {"received": 0, "inserted": 0, "failed": 0, "errors": [], "aborted": None}
+
+    def fail(number: int, message: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": number, "error": message})
+
+    async def flush(batch) -> bool:
+        # Decoding and validation are CPU work; keep them off the event loop
+        valid, errors = await run_in_threadpool(validate_batch, batch)
+        for number, message in errors:
+            fail(number, message)
+        if not valid:
+            return True
+        try:
+            await write([event for _, event in valid])
+        except Exception as e:
+            for number, _ in valid:
+                fail(number, "Not written")
+            summary["aborted"] = f"Write failed at line {valid[0][0]}: {e}"
+            return False
+        summary["inserted"] += len(valid)
+        return True
+
+    batch = []
+    async for number, line in iter_lines(chunks):
+        summary["received"] += 1
+        batch.append((number, line))
+        if len(batch) >= BULK_BATCH_SIZE:
+            if not await flush(batch):
+                break
+            batch = []
+    else:
+        if batch:
+            await flush(batch)
+    summary["errors_truncated"] = summary["failed"] > len(summary["errors"])
+    return summary
@@ -2,14 +2,27 @@
 AI Evolution Atlas - FastAPI Application
 Main API routes and application setup.
 """
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from typing import Optional
+import csv
+import io
+import json
+import logging
 import os
 
 from .models import EventCategory, EventResponse, StatsResponse
 from . import database as db
+from . import images
+from . import ingest
+from . import metrics
+from . import profiling
+from .profiling import run_in_threadpool
+from . import render
+from . import scheduler
+
+logger = logging.getLogger(__name__)
 
 # Create FastAPI app
 app = FastAPI(
@@ -17,6 +30,23 @@ app = FastAPI(
     description="The Eternal AI Timeline - Interactive history of AI and milestones",
     version="1.0.0"
 )
+app.add_middleware(metrics.MetricsMiddleware)
+if profiling.PROFILE_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+@app.on_event("startup")
+async def start_scheduler():
+    """Build the indexes and start the optional background refresh (AIONOS_REFRESH_INTERVAL)."""
+    scheduler.warm_in_background()
+    if scheduler.scheduler is not None:
+        scheduler.scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    if scheduler.scheduler is not None:
+        scheduler.scheduler.stop()
+
 
 # Get the directory where this file is located
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -28,23 +58,54 @@ if os.path.exists(STATIC_DIR):
     app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 
+# Serve / with the timeline already rendered and its data inlined (AIONOS_SSR=0 to disable)
+SSR_ENABLED = os.getenv("AIONOS_SSR", "1") != "0"
+
+
+def _versioned_response(request: Request, body: bytes, etag: str, stale: bool, media_type: str) -> Response:
+    """A per-dataset-version rendering: browsers revalidate and get 304 until the data changes."""
+    headers = {"Cache-Control": "no-cache", "ETag": etag}
+    if stale:
+        headers["X-Data-Stale"] = "1"
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Serve the main HTML page."""
     index_path = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    return {"message": "AI Evolution Atlas API", "docs": "/docs"}
+    if not os.path.exists(index_path):
+        return {"message": "AI Evolution Atlas API", "docs": "/docs"}
+    if SSR_ENABLED:
+        try:
+            version = await run_in_threadpool(db.get_dataset_version)
+            body, etag, stale = await run_in_threadpool(render.page_html, version, index_path)
+            return _versioned_response(request, body, etag, stale, "text/html")
+        except Exception as e:
+            # The static page still works; app.js then loads the data itself
+            logger.warning("Server-side render failed, serving the static page: %s", e)
+    return FileResponse(index_path)
+
+
+def _stale_header(response: Response, stale: bool):
+    """Flag answers served from fallback data while the database is degraded."""
+    if stale:
+        response.headers["X-Data-Stale"] = "1"
 
 
 @app.get("/api/events")
 async def get_events(
+    response: Response,
     category: Optional[EventCategory] = Query(None, description="Filter by category"),
     importance: Optional[int] = Query(None, ge=1, le=5, description="Minimum importance (1-5)"),
     year_from: Optional[int] = Query(None, ge=1940, description="Start year"),
     year_to: Optional[int] = Query(None, le=2030, description="End year"),
     search: Optional[str] = Query(None, description="Search in title/description"),
-    limit: int = Query(500, ge=1, le=1000, description="Max results")
+    limit: int = Query(500, ge=1, le=1000, description="Max results"),
+    rank: str = Query("date", pattern="^(date|relevance)$", description="date or relevance (with search)"),
+    facets: bool = Query(False, description="Also return counts per category, importance and year")
 ):
     """
     Get all AI events with optional filters.
@@ -53,28 +114,171 @@ async def get_events(
     - **importance**: Minimum importance level (1=minor, 5=major)
     - **year_from/year_to**: Filter by year range
     - **search**: Full-text search in title and description
+    - **rank**: `relevance` returns search matches best first (BM25, title
+      matches weigh more, important events rank higher) instead of by date
+    - **facets**: Add `facets` with counts per category, importance and year;
+      each is counted under all filters except its own, over the same
+      search matches as the events (any term with `rank=relevance`)
+    
+    `stale` is true when the database was slow or down and the events
+    come from the last good copy. Facet counts then come from the last
+    good copy or the local snapshot, and are left out if neither has them.
     """
     try:
-        events = db.get_all_events(
+        # Off the event loop, so concurrent identical queries can be coalesced
+        events, stale = await run_in_threadpool(
+            db.call_tracking_staleness,
+            db.get_all_events,
             category=category.value if category else None,
             importance=importance,
             year_from=year_from,
             year_to=year_to,
             search=search,
-            limit=limit
+            limit=limit,
+            rank=rank
         )
-        return {"events": events, "total": len(events)}
+        result = {"events": events, "total": len(events)}
+        if facets:
+            try:
+                result["facets"], facets_stale = await run_in_threadpool(
+                    db.call_tracking_staleness,
+                    db.get_event_facets,
+                    category=category.value if category else None,
+                    importance=importance,
+                    year_from=year_from,
+                    year_to=year_to,
+                    search=search,
+                    rank=rank
+                )
+            except Exception as e:
+                # Counts are an extra: with nothing to fall back on, serve the events without them
+                logger.warning("Facet counts unavailable: %s", e)
+                facets_stale = True
+            stale = stale or facets_stale
+        result["stale"] = stale
+        _stale_header(response, stale)
+        return result
     except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+EXPORT_FIELDS = [
+    "id", "title", "description", "year", "month", "day",
+    "category", "importance", "source_url", "image_url"
+]
+
+
+def _export_ndjson(events):
+    """Encode events as newline-delimited JSON, one page per chunk."""
+    buffer = []
+    for event in events:
+        buffer.append(json.dumps(event, ensure_ascii=False, default=str))
+        if len(buffer) >= 500:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+def _export_csv(events):
+    """Encode events as CSV with a header row, one page per chunk."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for i, event in enumerate(events, start=1):
+        writer.writerow(event)
+        if i % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@app.get("/api/events/export")
+async def export_events(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    category: Optional[EventCategory] = Query(None, description="Filter by category"),
+    importance: Optional[int] = Query(None, ge=1, le=5, description="Minimum importance (1-5)"),
+    year_from: Optional[int] = Query(None, ge=1940, description="Start year"),
+    year_to: Optional[int] = Query(None, le=2030, description="End year"),
+    search: Optional[str] = Query(None, description="Search in title/description")
+):
+    """
+    Stream the complete filtered timeline without the /api/events limit.
+    
+    Rows are pulled from the database page by page while the response
+    is being sent, so memory stays flat whatever the table size.
+    """
+    events = db.iter_events(
+        category=category.value if category else None,
+        importance=importance,
+        year_from=year_from,
+        year_to=year_to,
+        search=search
+    )
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(events),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=events.csv"}
+        )
+    return StreamingResponse(_export_ndjson(events), media_type="application/x-ndjson")
+
+
+@app.post("/api/events/bulk")
+async def bulk_insert_events(request: Request):
+    """
+    Insert events from a newline-delimited JSON body, one EventCreate per line.
+    
+    The body is streamed and validated in batches, and valid events are
+    written batch by batch. Invalid lines are skipped and listed under
+    `errors` (line number and reason) without rejecting the upload; if
+    a write fails, the upload stops and `aborted` says where.
+    
+    Requires `Authorization: Bearer <AIONOS_INGEST_TOKEN>`; without that
+    setting the endpoint is disabled.
+    """
+    if not ingest.is_enabled():
+        raise HTTPException(status_code=403, detail="Bulk insert is disabled. Set AIONOS_INGEST_TOKEN to enable it.")
+    if not ingest.is_authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Invalid or missing ingest token",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if db.is_demo_mode():
+        raise HTTPException(status_code=403, detail="Cannot insert events in demo mode. Configure Supabase first.")
+    
+    async def write(events):
+        await run_in_threadpool(db.insert_events_batch, events)
+    
+    return await ingest.ingest(request.stream(), write)
+
+
+@app.get("/api/events/changes")
+async def get_event_changes(
+    since: Optional[str] = Query(None, description="Token returned by the previous call"),
+    limit: int = Query(500, ge=1, le=1000, description="Max changed events per call")
+):
+    """
+    Get events inserted or updated since a sync token.
+    
+    Omit `since` for the initial sync, then pass the returned `next`
+    token on each refresh to fetch only what changed.
+    """
+    try:
+        return await run_in_threadpool(db.get_changes, since=since, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 @app.get("/api/events/{event_id}")
-async def get_event(event_id: int):
+async def get_event(event_id: int, response: Response):
     """Get a single event by ID."""
     try:
-        event = db.get_event_by_id(event_id)
+        event, stale = await run_in_threadpool(db.call_tracking_staleness, db.get_event_by_id, event_id)
+        _stale_header(response, stale)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
         return event
@@ -84,15 +288,112 @@ async def get_event(event_id: int):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@app.get("/api/events/{event_id}/related")
+async def get_related(
+    event_id: int,
+    response: Response,
+    limit: int = Query(5, ge=1, le=10, description="Max related events")
+):
+    """
+    Get the events most similar to an event by title and description.
+    
+    Neighbors are precomputed, so this is a lookup; each event carries
+    a `similarity` score between 0 and 1.
+    """
+    try:
+        related, stale = await run_in_threadpool(
+            db.call_tracking_staleness, db.get_related_events, event_id, limit
+        )
+        _stale_header(response, stale)
+        if related is None:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return {"events": related, "total": len(related)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# The URL is per event, not per image, so revalidate via ETag rather than mark immutable
+IMAGE_CACHE_CONTROL = "public, max-age=604800, stale-while-revalidate=86400"
+
+
+@app.get("/api/events/{event_id}/image")
+async def get_event_image(
+    event_id: int,
+    request: Request,
+    w: int = Query(320, ge=1, le=4096, description="Wanted width; rounded up to 160, 320, 640 or 1280")
+):
+    """
+    Get the event's image as a WebP thumbnail.
+    
+    Thumbnails are made once per fixed width and served from a disk
+    cache. The ETag is derived from the original's content and the
+    width, so it changes whenever either does.
+    """
+    try:
+        event, _ = await run_in_threadpool(db.call_tracking_staleness, db.get_event_by_id, event_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not event or not event.get("image_url"):
+        raise HTTPException(status_code=404, detail="Event image not found")
+    
+    service = images.get_service()
+    # Answered without touching the origin while its last check is recent
+    key = await run_in_threadpool(service.cached_key, event["image_url"], w)
+    if key is not None and request.headers.get("if-none-match") == f'"{key}"':
+        return Response(status_code=304, headers={"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": f'"{key}"'})
+    try:
+        key, data = await run_in_threadpool(service.thumbnail, event["image_url"], w)
+    except images.ImageError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": f'"{key}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="image/webp", headers=headers)
+
+
+@app.get("/api/timeline")
+async def get_timeline(
+    response: Response,
+    year_from: int = Query(1950, ge=1940, le=2030, description="Viewport start year"),
+    year_to: int = Query(2030, ge=1940, le=2030, description="Viewport end year"),
+    buckets: int = Query(20, ge=1, le=200, description="Number of time buckets in the viewport"),
+    per_bucket: int = Query(3, ge=1, le=50, description="Events shown per bucket")
+):
+    """
+    Get a level-of-detail view of the timeline.
+    
+    Returns, for each time bucket, the most important events and the
+    number of hidden ones, so zoomed-out views stay small.
+    """
+    if year_from > year_to:
+        raise HTTPException(status_code=400, detail="year_from must not exceed year_to")
+    try:
+        timeline, stale = await run_in_threadpool(
+            db.call_tracking_staleness,
+            db.get_timeline,
+            year_from=year_from,
+            year_to=year_to,
+            buckets=buckets,
+            per_bucket=per_bucket
+        )
+        _stale_header(response, stale)
+        return timeline
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 @app.get("/api/stats", response_model=StatsResponse)
-async def get_stats():
+async def get_stats(response: Response):
     """
     Get statistics about AI events.
     
     Returns counts by year and category for charts.
     """
     try:
-        stats = db.get_event_stats()
+        stats, stale = await run_in_threadpool(db.call_tracking_staleness, db.get_event_stats)
+        _stale_header(response, stale)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -101,12 +402,22 @@ async def get_stats():
 @app.get("/api/categories")
 async def get_categories():
     """Get list of all event categories."""
-    return {
-        "categories": [
-            {"value": cat.value, "label": cat.value.title()} 
-            for cat in EventCategory
-        ]
-    }
+    return {"categories": render.get_categories()}
+
+
+@app.get("/api/bootstrap")
+async def get_bootstrap(request: Request):
+    """
+    Everything the page needs on load in one response: the default
+    /api/events page, /api/stats and /api/categories, plus the dataset
+    `version` they belong to. Built once per version.
+    """
+    try:
+        version = await run_in_threadpool(db.get_dataset_version)
+        body, etag, stale = await run_in_threadpool(render.bootstrap_json, version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return _versioned_response(request, body, etag, stale, "application/json")
 
 
 @app.get("/health")
@@ -117,3 +428,12 @@ async def health_check():
         "service": "aionos",
         "demo_mode": db.is_demo_mode()
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request, database and cache metrics in Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render_metrics(),
+        media_type="text/plain; version=0.0.4"
+    )
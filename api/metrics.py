@@ -0,0 +1,330 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Recording is lock-free: every thread writes to its own shard of each
+metric, and shards are only merged when /metrics is scraped.
+"""
+import bisect
+import threading
+import time
+from functools import wraps
+from typing import Dict, List, Tuple
+
+# Latency buckets in seconds (1ms .. 10s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Size buckets for row counts and payload bytes
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_registry = []
+
+
+class _Metric:
+    """Base class holding one shard of label values per recording thread."""
+
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        _registry.append(self)
+
+    def _shard(self) -> Dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            # The lock is only taken once per thread, when its shard is created
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self) -> List[Dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy() runs without releasing the GIL, so it is a consistent view
+        return [shard.copy() for shard in shards]
+
+    def _label_str(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        totals = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return [f"{self.name}{self._label_str(labels)} {_fmt(value)}"
+                for labels, value in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    """Histogram with fixed upper bounds, exposed as cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # One slot per bucket plus +Inf, then sum and count
+            state = shard[labels] = [0] * (len(self.buckets) + 3)
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def render(self) -> List[str]:
+        totals = {}
+        for shard in self._snapshots():
+            for labels, state in shard.items():
+                merged = totals.setdefault(labels, [0] * len(state))
+                for i, value in enumerate(list(state)):
+                    merged[i] += value
+
+        lines = []
+        for labels, state in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _fmt(bound)
+                le_label = 'le="%s"' % le
+                lines.append(f"{self.name}_bucket{self._label_str(labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_str(labels)} {_fmt(state[-2])}")
+            lines.append(f"{self.name}_count{self._label_str(labels)} {state[-1]}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ============================================
+# Metrics
+# ============================================
+
+HTTP_REQUEST_DURATION = Histogram(
+    "aionos_http_request_duration_seconds",
+    "HTTP request latency by route and status",
+    ("method", "route", "status")
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    "aionos_http_response_bytes",
+    "HTTP response payload size by route",
+    ("method", "route"),
+    buckets=BYTE_BUCKETS
+)
+DB_CALL_DURATION = Histogram(
+    "aionos_db_call_duration_seconds",
+    "Database call latency by backend and operation",
+    ("backend", "operation")
+)
+DB_ROWS_RETURNED = Histogram(
+    "aionos_db_rows_returned",
+    "Rows returned per database call",
+    ("backend", "operation"),
+    buckets=ROW_BUCKETS
+)
+DB_ERRORS = Counter(
+    "aionos_db_errors_total",
+    "Database calls that raised",
+    ("backend", "operation")
+)
+CACHE_REQUESTS = Counter(
+    "aionos_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ("cache", "result")
+)
+STALE_RESPONSES = Counter(
+    "aionos_db_stale_responses_total",
+    "Database calls answered from fallback data, by reason (timeout/error/open breaker)",
+    ("operation", "reason")
+)
+REFRESH_DURATION = Histogram(
+    "aionos_refresh_duration_seconds",
+    "Background data refresh duration by result (ok/error)",
+    ("result",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+COALESCED_CALLS = Counter(
+    "aionos_coalesced_calls_total",
+    "Coalesced backend calls by operation and role (leader ran it, shared joined it)",
+    ("operation", "role")
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup."""
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def record_stale(operation: str, reason: str):
+    """Count a call answered from fallback data instead of the backend."""
+    STALE_RESPONSES.inc(operation, reason)
+
+
+def record_refresh(result: str, seconds: float):
+    """Record one background refresh round."""
+    REFRESH_DURATION.observe(seconds, result)
+
+
+def record_coalesce(operation: str, leader: bool):
+    """Count a call that either ran upstream or joined an identical in-flight one."""
+    COALESCED_CALLS.inc(operation, "leader" if leader else "shared")
+
+
+def _count_rows(result) -> int:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) and isinstance(result.get("events"), list):
+        return len(result["events"])
+    if isinstance(result, dict) and isinstance(result.get("buckets"), list):
+        return sum(len(b.get("events", ())) for b in result["buckets"])
+    return 0 if result is None else 1
+
+
+def instrument_db(operation: str, backend):
+    """
+    Decorator timing a database function and counting the rows it returns.
+    `backend` is a callable returning the active backend name.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            labels = (backend(), operation)
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                DB_ERRORS.inc(*labels)
+                raise
+            finally:
+                DB_CALL_DURATION.observe(time.perf_counter() - start, *labels)
+            DB_ROWS_RETURNED.observe(_count_rows(result), *labels)
+            return result
+        return wrapper
+    return decorator
+
+
+def instrument_db_iter(operation: str, backend):
+    """
+    Like instrument_db for generators: times only the work done inside
+    the generator and records the row count once it is exhausted or closed.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            labels = (backend(), operation)
+            iterator = func(*args, **kwargs)
+            elapsed = 0.0
+            rows = 0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        row = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    rows += 1
+                    yield row
+            except GeneratorExit:
+                iterator.close()
+                raise
+            except Exception:
+                DB_ERRORS.inc(*labels)
+                raise
+            finally:
+                DB_CALL_DURATION.observe(elapsed, *labels)
+                DB_ROWS_RETURNED.observe(rows, *labels)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and response size per route.
+    Routes are labelled by their path template, so ids don't explode cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    def _route_label(self, scope, path: str) -> str:
+        if self._route_paths is None:
+            router = scope["app"].router
+            self._route_paths = {
+                getattr(r, "endpoint", None): r.path for r in router.routes
+                if getattr(r, "endpoint", None) is not None
+            }
+        route = self._route_paths.get(scope.get("endpoint"))
+        if route:
+            return route
+        if path.startswith("/static/"):
+            return "/static"
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        path = scope["path"]
+        status = [500]
+        size = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                size[0] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_label(scope, path)
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route, str(status[0]))
+            HTTP_RESPONSE_BYTES.observe(size[0], method, route)
+
+
+def render_metrics() -> str:
+    """Render every registered metric in Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,180 @@
+"""
+Opt-in per-request profiling.
+
+Enabled with AIONOS_PROFILE=1. A request is then profiled when it sends
+an `X-Profile: 1` header or is picked by AIONOS_PROFILE_SAMPLE_RATE.
+Each profile is dumped to a bounded directory (AIONOS_PROFILE_DIR,
+keeping the newest AIONOS_PROFILE_KEEP files) and summarized in the
+`X-Profile-Summary` response header; `X-Profile-Id` names the dump
+file. Open dumps with `python -m pstats <file>` or snakeviz.
+
+The middleware is only installed when profiling is enabled, so
+unprofiled deployments pay nothing. One request per process is profiled
+at a time; requests arriving meanwhile are served unprofiled.
+
+cProfile only follows the thread it was enabled on, so work a route
+hands to other threads must go through run_in_threadpool() below (or a
+function wrapped with profiled()); it is then profiled in its thread
+and merged into the request's profile.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILE_ENABLED = os.getenv("AIONOS_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.getenv("AIONOS_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("AIONOS_PROFILE_DIR", os.path.join(BASE_DIR, "data", "profiles"))
+PROFILE_KEEP = int(os.getenv("AIONOS_PROFILE_KEEP", "50"))
+
+# Functions listed in the summary header
+SUMMARY_TOP = 3
+
+# Held while a request is profiled: a second profiler enabled on the
+# event-loop thread would replace the first one's hook (and raises on 3.12+)
+_active = threading.Lock()
+
+# Set while a request is profiled: profiles of its calls on other threads
+_thread_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("thread_profiles", default=None)
+
+
+def _run_profiled(profiles: List[cProfile.Profile], func: Callable, *args, **kwargs):
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 3.12+: profiling is process-wide, so the request's profiler already sees this thread
+        profiler = None
+    # Threads don't inherit the request's context; nested hand-offs need it
+    token = _thread_profiles.set(profiles)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _thread_profiles.reset(token)
+        if profiler is not None:
+            profiler.disable()
+            profiles.append(profiler)
+
+
+def profiled(func: Callable) -> Callable:
+    """func, profiled into the current request's profile wherever it runs; func itself if none."""
+    profiles = _thread_profiles.get()
+    if profiles is None:
+        return func
+    return functools.partial(_run_profiled, profiles, func)
+
+
+async def run_in_threadpool(func: Callable, *args, **kwargs):
+    """starlette's run_in_threadpool, with func profiled when the request is."""
+    return await _run_in_threadpool(profiled(func), *args, **kwargs)
+
+
+def summarize(stats: pstats.Stats, elapsed: float) -> str:
+    """One-line summary: wall time and the functions with the most own time."""
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+    top = []
+    for (filename, line, name), (_, _, tottime, cumtime, _) in entries[:SUMMARY_TOP]:
+        location = f"{os.path.basename(filename)}:{line}" if line else "builtin"
+        top.append(f"{name}({location}) self={tottime * 1000:.1f}ms cum={cumtime * 1000:.1f}ms")
+    return f"total={elapsed * 1000:.1f}ms; " + "; ".join(top)
+
+
+def _existing_dumps() -> List[str]:
+    names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".prof")]
+    # Names start with a nanosecond timestamp, so they sort oldest first
+    return sorted(os.path.join(PROFILE_DIR, n) for n in names)
+
+
+def dump_name(method: str, path: str) -> str:
+    """Unique, time-ordered file name for a request's profile."""
+    route = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return f"{time.time_ns()}-{os.getpid()}-{method}-{route[:60]}.prof"
+
+
+def save_dump(stats: pstats.Stats, filename: str):
+    """Write a profile into the ring directory, evicting the oldest dumps."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stats.dump_stats(os.path.join(PROFILE_DIR, filename))
+
+    dumps = _existing_dumps()
+    for old in dumps[:max(0, len(dumps) - PROFILE_KEEP)]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # Another worker evicted it first
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running selected requests under cProfile.
+
+    cProfile follows the event-loop thread, so work from other requests
+    interleaved at await points on the same worker can show up in a profile.
+    Calls made through run_in_threadpool() / profiled() are profiled in
+    their own threads and merged in.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _should_profile(self, scope) -> bool:
+        for key, value in scope.get("headers", ()):
+            if key == b"x-profile":
+                return value in (b"1", b"true")
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        if not _active.acquire(blocking=False):
+            # Another request is being profiled on this worker
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _active.release()
+
+    async def _profile(self, scope, receive, send):
+        profiler = cProfile.Profile()
+        thread_profiles = []
+        filename = dump_name(scope["method"], scope["path"])
+        start = time.perf_counter()
+
+        def combined() -> pstats.Stats:
+            return pstats.Stats(profiler, *thread_profiles, stream=io.StringIO())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Summarize everything up to the response headers
+                profiler.disable()
+                summary = summarize(combined(), time.perf_counter() - start)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-summary", summary.encode("latin-1", "replace")))
+                headers.append((b"x-profile-id", filename.encode("latin-1")))
+                message = {**message, "headers": headers}
+                await send(message)
+                profiler.enable()
+                return
+            await send(message)
+
+        token = _thread_profiles.set(thread_profiles)
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            _thread_profiles.reset(token)
+            save_dump(combined(), filename)
@@ -0,0 +1,88 @@
+"""
+Compact in-memory event representation for the demo store.
+
+Records are slotted objects instead of dicts, and the strings that
+repeat across many events (category, source_url) are interned so each
+distinct value is stored once. They are converted to plain dicts only
+when an API response is built.
+"""
+import sys
+from typing import Dict, Optional
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class EventRecord:
+    """A single timeline event."""
+
+    __slots__ = (
+        "id", "title", "description", "year", "month", "day",
+        "category", "importance", "source_url", "image_url"
+    )
+
+    def __init__(self, id: int, title: str, year: int, category: str, importance: int = 3,
+                 description: str = None, month: int = None, day: int = None,
+                 source_url: str = None, image_url: str = None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.year = year
+        self.month = month
+        self.day = day
+        self.category = _intern(category)
+        self.importance = importance
+        self.source_url = _intern(source_url)
+        self.image_url = image_url
+
+    @classmethod
+    def from_dict(cls, event: Dict, id: int = None) -> "EventRecord":
+        """Build a record from an event dict, optionally overriding its id."""
+        return cls(
+            id=event.get("id") if id is None else id,
+            title=event.get("title", ""),
+            year=event.get("year", 0),
+            category=event.get("category") or "other",
+            importance=event.get("importance") or 3,
+            description=event.get("description"),
+            month=event.get("month"),
+            day=event.get("day"),
+            source_url=event.get("source_url"),
+            image_url=event.get("image_url")
+        )
+
+    def to_dict(self) -> Dict:
+        """Serialize for API responses; unset optional fields are omitted."""
+        event = {
+            "id": self.id,
+            "title": self.title,
+            "year": self.year,
+            "category": self.category,
+            "importance": self.importance
+        }
+        # Spelled out rather than looped: this runs once per returned event
+        if self.description is not None:
+            event["description"] = self.description
+        if self.month is not None:
+            event["month"] = self.month
+        if self.day is not None:
+            event["day"] = self.day
+        if self.source_url is not None:
+            event["source_url"] = self.source_url
+        if self.image_url is not None:
+            event["image_url"] = self.image_url
+        return event
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EventRecord):
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"EventRecord(id={self.id!r}, year={self.year!r}, title={self.title!r})"
@@ -0,0 +1,269 @@
+"""
+Precomputed "related events" via TF-IDF cosine similarity.
+
+Titles and descriptions become L2-normalized TF-IDF rows of a sparse
+matrix. Neighbors for every event are computed up front, a block of
+rows at a time: one sparse-dense product gives the block's similarity
+to every event and argpartition picks each row's top k, so a lookup
+is a dictionary read. Events added later are vectorized with the
+existing idf weights (new terms get one from their own frequency) and
+merged into the neighbor lists incrementally.
+
+An index can also sit on vectors and neighbor lists computed elsewhere
+(from_arrays, e.g. over a mapped snapshot); events added to it are kept
+on top, so the shared arrays are never copied.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .search import TITLE_BOOST, tokenize
+
+# Neighbors kept per event
+RELATED_K = 10
+# Pairs less similar than this are not worth showing
+MIN_SIMILARITY = 0.05
+# Terms in more than this share of events carry no signal and only densify the products
+MAX_DOCUMENT_SHARE = 0.5
+# Cells per dense block (rows x events, rows x terms); bounds memory at 8 bytes each
+BLOCK_CELLS = 4_000_000
+
+
+class RelatedIndex:
+    """TF-IDF vectors and top-k neighbor lists for a set of events, keyed by id."""
+
+    def __init__(self, docs: Iterable[Tuple[int, str, Optional[str]]], k: int = RELATED_K):
+        """`docs` yields (event_id, title, description)."""
+        self.k = k
+        self._lock = threading.Lock()
+        self.ids: List[int] = []
+        counts = []
+        self.vocabulary: Dict[str, int] = {}
+        for event_id, title, description in docs:
+            self.ids.append(event_id)
+            doc_counts = _term_counts(title, description)
+            for term in doc_counts:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+            counts.append(doc_counts)
+
+        # Smoothed idf, fixed from here on so existing vectors stay valid as events are added
+        document_frequency = np.zeros(len(self.vocabulary))
+        for doc_counts in counts:
+            for term in doc_counts:
+                document_frequency[self.vocabulary[term]] += 1
+        self.idf = np.log((1 + len(counts)) / (1 + document_frequency)) + 1
+        self.idf[document_frequency > MAX_DOCUMENT_SHARE * max(len(counts), 2)] = 0
+
+        matrix = self._vectorize(counts)
+        # Row blocks: the initial vectors, then (if any) the rows added since
+        self._blocks = [matrix]
+        self.neighbors: Dict[int, List[Tuple[int, float]]] = {}
+        # Score a newcomer must beat to enter each row's list
+        self._floor = np.zeros(len(self.ids))
+        block_rows = self._block_rows()
+        for start in range(0, len(self.ids), block_rows):
+            self._store_top_k(self._similarities(matrix[start:start + block_rows]), start)
+
+    @classmethod
+    def from_arrays(cls, ids: Sequence[int], vocabulary, idf, data, indices, indptr, neighbors,
+                    k: int = RELATED_K) -> "RelatedIndex":
+        """
+        An index over vectors and neighbor lists computed elsewhere. The
+        arrays (CSR rows in `vocabulary` column order) may be read-only
+        buffers; `vocabulary` (term -> column) and `neighbors` (event id ->
+        list) only need get().
+        """
+        index = cls.__new__(cls)
+        index.k = k
+        index._lock = threading.Lock()
+        index.ids = list(ids)
+        index.idf = np.frombuffer(idf, dtype=np.float64)
+        index.vocabulary = _Layered(vocabulary, len(index.idf))
+        index._blocks = [sparse.csr_matrix((
+            np.frombuffer(data, dtype=np.float64),
+            np.frombuffer(indices, dtype=np.int32),
+            np.frombuffer(indptr, dtype=np.int32),
+        ), shape=(len(index.ids), len(index.idf)))]
+        index.neighbors = _Layered(neighbors)
+        index._floor = np.zeros(len(index.ids))
+        for row, event_id in enumerate(index.ids):
+            known = neighbors.get(event_id) or ()
+            if len(known) == k:
+                index._floor[row] = known[-1][1]
+        return index
+
+    @property
+    def matrix(self) -> sparse.csr_matrix:
+        """Every event's vector, one row per event in ids order."""
+        width = len(self.vocabulary)
+        return sparse.vstack(
+            [sparse.csr_matrix(block, shape=(block.shape[0], width)) for block in self._blocks], format="csr"
+        )
+
+    def vectors(self, terms: Sequence[str]) -> Tuple[np.ndarray, sparse.csr_matrix]:
+        """The idf weights and matrix with columns in the order of `terms`, which must cover the vocabulary."""
+        columns = np.fromiter((self.vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+        matrix = self.matrix[:, columns]
+        matrix.sort_indices()
+        return self.idf[columns], matrix
+
+    def _vectorize(self, counts: List[Dict[str, float]]) -> sparse.csr_matrix:
+        rows, columns, frequencies = [], [], []
+        for row, doc_counts in enumerate(counts):
+            for term, count in doc_counts.items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    frequencies.append(count)
+        columns = np.asarray(columns, dtype=np.int64)
+        values = (1 + np.log(np.asarray(frequencies, dtype=np.float64))) * self.idf[columns]
+        matrix = sparse.csr_matrix(
+            (values, (rows, columns)), shape=(len(counts), len(self.vocabulary)), dtype=np.float64
+        )
+        matrix.eliminate_zeros()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ matrix
+
+    def _block_rows(self) -> int:
+        # Both the similarity block and the densified rows it is computed from stay bounded
+        return max(1, BLOCK_CELLS // max(len(self.ids), len(self.vocabulary), 1))
+
+    def _similarities(self, rows: sparse.csr_matrix) -> np.ndarray:
+        """Dense (rows x all events) cosine similarities."""
+        dense = rows.T.toarray()
+        # Earlier blocks have fewer columns; the terms they lack contribute nothing
+        return np.vstack([np.asarray(block @ dense[:block.shape[1]]) for block in self._blocks]).T
+
+    def _store_top_k(self, similarities: np.ndarray, first_row: int):
+        """Keep the best k neighbors of each row of a (rows x all events) similarity block."""
+        count, total = similarities.shape
+        similarities[np.arange(count), np.arange(first_row, first_row + count)] = 0  # Not itself
+        k = min(self.k, total)
+        if k < total:
+            best = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            best = np.tile(np.arange(total), (count, 1))
+        scores = np.take_along_axis(similarities, best, axis=1)
+        # Best first, ties to the lower position
+        order = np.lexsort((best, -scores), axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        for i in range(count):
+            keep = scores[i] >= MIN_SIMILARITY
+            self.neighbors[self.ids[first_row + i]] = [
+                (self.ids[c], round(float(s), 4)) for c, s in zip(best[i][keep], scores[i][keep])
+            ]
+            self._floor[first_row + i] = scores[i][-1] if keep.all() and k == self.k else 0
+
+    def add(self, docs: Iterable[Tuple[int, str, Optional[str]]]):
+        """
+        Index new events: compute their neighbors and merge them into the
+        lists of existing events they are now among the top k of.
+        """
+        docs = list(docs)
+        if not docs:
+            return
+        with self._lock:
+            first_new = len(self.ids)
+            counts = [_term_counts(title, description) for _, title, description in docs]
+            self._extend_vocabulary(counts)
+            new_rows = self._vectorize(counts)
+            self.ids.extend(event_id for event_id, _, _ in docs)
+            if len(self._blocks) > 1:
+                # Added rows share one block, so the initial one is never copied
+                added = self._blocks.pop()
+                added = sparse.csr_matrix(added, shape=(added.shape[0], new_rows.shape[1]))
+                self._blocks.append(sparse.vstack([added, new_rows], format="csr"))
+            else:
+                self._blocks.append(new_rows)
+            self._floor = np.concatenate([self._floor, np.zeros(len(docs))])
+
+            block_rows = self._block_rows()
+            for start in range(0, len(docs), block_rows):
+                similarities = self._similarities(new_rows[start:start + block_rows])
+                # Scores against the events that existed before, copied before self-masking
+                incoming = similarities[:, :first_new].copy()
+                self._store_top_k(similarities, first_new + start)
+                self._merge_incoming(incoming, first_new + start)
+
+    def _extend_vocabulary(self, counts: List[Dict[str, float]]):
+        """Give terms first seen in new events a column and an idf."""
+        frequencies = {}
+        for doc_counts in counts:
+            for term in doc_counts:
+                if term not in self.vocabulary:
+                    frequencies[term] = frequencies.get(term, 0) + 1
+        if not frequencies:
+            return
+        total = len(self.ids) + len(counts)
+        for term in frequencies:
+            self.vocabulary[term] = len(self.vocabulary)
+        new_idf = np.log((1 + total) / (1 + np.fromiter(frequencies.values(), dtype=np.float64))) + 1
+        self.idf = np.concatenate([self.idf, new_idf])
+
+    def _merge_incoming(self, incoming: np.ndarray, first_row: int):
+        """Add new rows to the lists of existing events they now make the top k of."""
+        if not incoming.size:
+            return
+        # Only columns a newcomer beats are touched, found without a Python loop over all
+        best = incoming.max(axis=0)
+        beaten = (best >= MIN_SIMILARITY) & (best > self._floor[:incoming.shape[1]])
+        for column in np.flatnonzero(beaten):
+            event_id = self.ids[column]
+            candidates = list(self.neighbors.get(event_id, ()))
+            for row in np.flatnonzero(incoming[:, column] >= MIN_SIMILARITY):
+                candidates.append((self.ids[first_row + row], round(float(incoming[row, column]), 4)))
+            candidates.sort(key=lambda pair: (-pair[1], pair[0]))
+            candidates = candidates[:self.k]
+            # Swapped in whole, so readers never see a half-updated list
+            self.neighbors[event_id] = candidates
+            self._floor[column] = candidates[-1][1] if len(candidates) == self.k else 0
+
+    def related(self, event_id: int, limit: int = RELATED_K) -> Optional[List[Tuple[int, float]]]:
+        """(event_id, similarity) pairs, most similar first; None for an unknown event."""
+        neighbors = self.neighbors.get(event_id)
+        return None if neighbors is None else neighbors[:limit]
+
+
+class _Layered:
+    """A read-only mapping (anything with get()) plus entries set since, which win over it."""
+
+    def __init__(self, base, size: int = 0):
+        self._base = base
+        # len() of the base, for vocabularies that only ever gain new keys
+        self._size = size
+        self._added = {}
+
+    def get(self, key, default=None):
+        value = self._added.get(key)
+        if value is None:
+            value = self._base.get(key)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        self._added[key] = value
+
+    def __len__(self) -> int:
+        return self._size + len(self._added)
+
+
+def _term_counts(title: str, description: Optional[str]) -> Dict[str, float]:
+    counts = {}
+    for term in tokenize(title):
+        counts[term] = counts.get(term, 0) + TITLE_BOOST
+    for term in tokenize(description):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
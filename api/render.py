@@ -0,0 +1,184 @@
+"""
+Server-side rendering of the first page load.
+
+The bootstrap payload bundles what app.js would otherwise fetch in
+separate requests on load (the default /api/events page, /api/stats
+and /api/categories). The rendered page is static/index.html with the
+timeline and stats already filled in and the payload inlined, so the
+first paint needs no API call at all; app.js attaches its handlers to
+the rendered cards instead of fetching and rendering them again.
+
+Both are built once per dataset version (database.get_dataset_version)
+and kept until the version changes.
+"""
+import hashlib
+import json
+import threading
+from html import escape
+from typing import Callable, Dict, List, Tuple
+
+from . import database as db
+from .metrics import record_cache
+from .models import EventCategory
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def get_categories() -> List[Dict]:
+    """Category values and labels, as served by /api/categories."""
+    return [{"value": cat.value, "label": cat.value.title()} for cat in EventCategory]
+
+
+def build_bootstrap() -> Tuple[Dict, bool]:
+    """(payload, stale): default events, stats and categories in one object."""
+    events, events_stale = db.call_tracking_staleness(db.get_all_events)
+    stats, stats_stale = db.call_tracking_staleness(db.get_event_stats)
+    payload = {"events": events, "stats": stats, "categories": get_categories()}
+    return payload, events_stale or stats_stale
+
+
+# ============================================
+# Markup (mirrors renderTimeline / renderStats in static/js/app.js)
+# ============================================
+
+def format_date(event: Dict) -> str:
+    date = str(event["year"])
+    if event.get("month"):
+        date = f"{MONTHS[event['month'] - 1]} {date}"
+    if event.get("day"):
+        date = f"{event['day']} {date}"
+    return date
+
+
+def render_event_card(event: Dict) -> str:
+    category = event["category"]
+    dots = "".join(
+        f'<span class="importance-dot {"filled" if i <= (event.get("importance") or 3) else ""}"></span>'
+        for i in range(1, 6)
+    )
+    return (
+        f'<div class="event-card" data-event-id="{event["id"]}">'
+        f'<div class="event-importance">{dots}</div>'
+        f'<div class="event-header"><span class="event-category {escape(category)}">'
+        f'{escape(category[:1].upper() + category[1:], quote=False)}</span></div>'
+        f'<h3 class="event-title">{escape(event["title"], quote=False)}</h3>'
+        f'<p class="event-date">{format_date(event)}</p>'
+        f'<p class="event-description">{escape(event.get("description") or "", quote=False)}</p>'
+        f'</div>'
+    )
+
+
+def render_timeline(events: List[Dict]) -> str:
+    """Year markers followed by that year's cards, by month then day."""
+    by_year = {}
+    for event in events:
+        by_year.setdefault(event["year"], []).append(event)
+    parts = []
+    for year in sorted(by_year):
+        parts.append(f'<div class="timeline-year"><span class="year-label">{year}</span></div>')
+        year_events = sorted(by_year[year], key=lambda e: (e.get("month") or 0, e.get("day") or 0))
+        parts.extend(render_event_card(event) for event in year_events)
+    return "".join(parts)
+
+
+def _inline_json(payload: Dict) -> str:
+    """JSON safe to embed in a <script> element."""
+    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+    return text.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+
+def render_page(template: str, payload: Dict) -> str:
+    """index.html with the timeline, stats and bootstrap payload filled in."""
+    events, stats = payload["events"], payload["stats"] or {}
+    year_range = stats.get("year_range") or {}
+    replacements = [
+        ('<div class="loading" id="loading">', '<div class="loading" id="loading" style="display: none;">'),
+        ('<div class="timeline" id="timeline"></div>',
+         f'<div class="timeline" id="timeline">{render_timeline(events)}</div>'),
+        ('<span class="stat-number" id="total-events">-</span>',
+         f'<span class="stat-number" id="total-events">{stats.get("total_events") or 0}</span>'),
+        ('<span class="stat-number" id="categories-count">-</span>',
+         f'<span class="stat-number" id="categories-count">{len(stats.get("events_by_category") or {})}</span>'),
+        ('<script src="/static/js/app.js"></script>',
+         f'<script id="bootstrap" type="application/json">{_inline_json(payload)}</script>\n'
+         f'    <script src="/static/js/app.js"></script>'),
+    ]
+    if year_range.get("min") and year_range.get("max"):
+        replacements.append((
+            '<span class="stat-number" id="year-range">-</span>',
+            f'<span class="stat-number" id="year-range">{year_range["min"]}-{year_range["max"]}</span>'
+        ))
+    if not events:
+        replacements.append((
+            '<div class="no-results" id="no-results" style="display: none;">',
+            '<div class="no-results" id="no-results">'
+        ))
+    for old, new in replacements:
+        template = template.replace(old, new, 1)
+    return template
+
+
+# ============================================
+# Per-version cache
+# ============================================
+
+class VersionedCache:
+    """
+    Keeps one rendering per name for the current dataset version.
+    Renderings of stale (fallback) data are served but not kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (version, value)
+        self._entries: Dict[str, Tuple[str, object]] = {}
+
+    def get(self, name: str, version: str, build: Callable[[], Tuple[object, bool]]) -> Tuple[object, bool]:
+        """(value, stale) for name at version, building it on a miss."""
+        entry = self._entries.get(name)
+        record_cache(name, entry is not None and entry[0] == version)
+        if entry is None or entry[0] != version:
+            with self._lock:
+                # Concurrent misses for a new version build it once
+                entry = self._entries.get(name)
+                if entry is None or entry[0] != version:
+                    value, stale = build()
+                    if stale:
+                        return value, True
+                    entry = self._entries[name] = (version, value)
+        return entry[1], False
+
+
+_payloads = VersionedCache()
+_renderings = VersionedCache()
+
+
+def get_payload(version: str) -> Tuple[Dict, bool]:
+    """The bootstrap payload at version; shared by the page and /api/bootstrap."""
+    def build():
+        payload, stale = build_bootstrap()
+        payload["version"] = version
+        return payload, stale
+    return _payloads.get("bootstrap_payload", version, build)
+
+
+def _with_etag(body: bytes, stale: bool) -> Tuple[bytes, str, bool]:
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"', stale
+
+
+def bootstrap_json(version: str) -> Tuple[bytes, str, bool]:
+    """(body, etag, stale) of /api/bootstrap."""
+    def build():
+        payload, stale = get_payload(version)
+        return _with_etag(json.dumps(payload, ensure_ascii=False, default=str).encode(), stale), stale
+    return _renderings.get("bootstrap", version, build)[0]
+
+
+def page_html(version: str, template_path: str) -> Tuple[bytes, str, bool]:
+    """(body, etag, stale) of the rendered index page."""
+    def build():
+        with open(template_path, encoding="utf-8") as f:
+            template = f.read()
+        payload, stale = get_payload(version)
+        return _with_etag(render_page(template, payload).encode(), stale), stale
+    return _renderings.get("rendered_page", version, build)[0]
@@ -0,0 +1,179 @@
+"""
+Optional in-process background refresh.
+
+Enabled with AIONOS_REFRESH_INTERVAL (seconds). Every interval, give or
+take AIONOS_REFRESH_JITTER (a fraction, so workers drift apart), a
+daemon thread refreshes the data without touching the request path:
+
+- Demo mode: run_scraper runs in a separate process (HTML parsing
+  stays off this process's GIL), then the new demo store is built with
+  all its indexes and swapped in atomically. This data is per process,
+  so run.py gives multi-worker deployments a shared snapshot.
+- Demo mode with AIONOS_SNAPSHOT_PATH: the first worker to lock the
+  snapshot's lock file keeps the lock for its lifetime and is the only
+  one that scrapes and republishes, and only once the snapshot is an
+  interval old. Every worker (the leader included) maps the new file
+  on its next check; its indexes were built when it was written.
+- Supabase mode: the data lives in the database, so only the
+  in-memory related-events index is rebuilt.
+- Supabase mode with AIONOS_SNAPSHOT_PATH: the leader exports the
+  table to the snapshot instead, vectors and neighbor lists included,
+  and every worker maps it rather than building its own index.
+
+A scrape missing any source is rejected and the current data kept, so
+a failed download never shows up as deleted events.
+
+Independently of the interval, warm_in_background() runs once at
+startup: a worker without a snapshot builds its indexes, and with
+Supabase the leader exports a snapshot if one is due.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import database as db
+from .metrics import record_refresh
+from .snapshot import write_snapshot
+
+REFRESH_INTERVAL = float(os.getenv("AIONOS_REFRESH_INTERVAL", "0"))
+REFRESH_JITTER = float(os.getenv("AIONOS_REFRESH_JITTER", "0.1"))
+
+logger = logging.getLogger(__name__)
+
+
+def _scrape():
+    """Run a fresh scrape in a child process and return its events."""
+    from scraper.scraper import run_scraper
+
+    # spawn rather than fork: forking a process that runs threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_scraper, use_cache=False, strict=True).result()
+
+
+# Open lock file while this process is the publishing leader
+_leader_file = None
+
+
+def _lock(f):
+    """Lock f exclusively without blocking; OSError if another process holds it."""
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _is_leader(path: str) -> bool:
+    """
+    Whether this process publishes snapshots. The lock is taken without
+    blocking and never released, so leadership only moves to another
+    worker when the leader exits.
+    """
+    global _leader_file
+    if _leader_file is None:
+        f = open(path, "a")
+        try:
+            _lock(f)
+        except OSError:
+            f.close()
+            return False
+        _leader_file = f
+    return True
+
+
+def _snapshot_due(path: str) -> bool:
+    """Whether the snapshot is old enough to republish; a new leader doesn't redo a fresh one."""
+    try:
+        age = time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return True
+    return age >= REFRESH_INTERVAL * (1 - REFRESH_JITTER)
+
+
+def _publish_if_due():
+    """As the leader, write a new snapshot once the current one is an interval old."""
+    if not (_is_leader(db.SNAPSHOT_PATH + ".lock") and _snapshot_due(db.SNAPSHOT_PATH)):
+        return
+    if db.is_demo_mode():
+        # Ids are matched against the current data so they stay stable across refreshes
+        events = db.assign_demo_ids(_scrape())
+    else:
+        events = list(db.iter_events())
+    write_snapshot(events, db.SNAPSHOT_PATH)
+
+
+def refresh_once():
+    """One refresh round; see the module docstring."""
+    if db.SNAPSHOT_PATH:
+        _publish_if_due()
+        db.refresh_indexes()
+        return
+
+    if not db.is_demo_mode():
+        db.refresh_indexes()
+        return
+
+    db.replace_demo_events(_scrape(), warm=True)
+
+
+def _warm():
+    start = time.perf_counter()
+    try:
+        if db.SNAPSHOT_PATH and not db.is_demo_mode():
+            _publish_if_due()
+        db.warm_indexes()
+    except Exception as e:
+        logger.warning("Building indexes at startup failed: %s", e)
+    else:
+        logger.info("Indexes built in %.1fs", time.perf_counter() - start)
+
+
+def warm_in_background():
+    """Build the in-memory indexes in a daemon thread, so startup isn't delayed."""
+    threading.Thread(target=_warm, name="aionos-warm", daemon=True).start()
+
+
+class RefreshScheduler:
+    """Runs refresh_once on a jittered interval in a daemon thread."""
+
+    def __init__(self, interval: float, jitter: float = 0.1, refresh=refresh_once):
+        self.interval = interval
+        self.jitter = jitter
+        self.refresh = refresh
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_delay(self) -> float:
+        return max(1.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="aionos-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.next_delay()):
+            start = time.perf_counter()
+            try:
+                self.refresh()
+            except Exception as e:
+                record_refresh("error", time.perf_counter() - start)
+                logger.warning("Background refresh failed: %s", e)
+            else:
+                record_refresh("ok", time.perf_counter() - start)
+
+
+scheduler = RefreshScheduler(REFRESH_INTERVAL, REFRESH_JITTER) if REFRESH_INTERVAL > 0 else None
@@ -0,0 +1,107 @@
+"""
+BM25 relevance ranking for event search.
+
+TermIndex keeps an inverted index over event titles and descriptions,
+with title terms counted TITLE_BOOST times. A query only scores the
+events in the posting lists of its terms, and the best `k` come from a
+heap rather than from sorting every match.
+"""
+import heapq
+import math
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+# A title occurrence weighs as much as this many description occurrences
+TITLE_BOOST = 2.0
+# Score multiplier per importance level above 1 (importance 5 -> x1.4)
+IMPORTANCE_WEIGHT = 0.1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased alphanumeric terms."""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+def importance_boost(importance: int) -> float:
+    return 1 + IMPORTANCE_WEIGHT * (importance - 1)
+
+
+class TermIndex:
+    """Inverted index over (title, description) documents, addressed by position."""
+
+    def __init__(self, docs: Iterable[Tuple[str, Optional[str]]]):
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+        lengths: List[float] = []
+        for position, (title, description) in enumerate(docs):
+            title_terms = tokenize(title)
+            description_terms = tokenize(description)
+            frequencies = {}
+            for term in title_terms:
+                frequencies[term] = frequencies.get(term, 0) + TITLE_BOOST
+            for term in description_terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, frequency in frequencies.items():
+                postings.setdefault(term, []).append((position, frequency))
+            lengths.append(TITLE_BOOST * len(title_terms) + len(description_terms))
+        self._use(postings, lengths)
+
+    @classmethod
+    def from_postings(cls, postings, lengths: Sequence[float]) -> "TermIndex":
+        """
+        An index over postings built elsewhere, e.g. mapped from a snapshot.
+        `postings` only needs a get(term, default) returning (position, frequency) pairs.
+        """
+        index = cls.__new__(cls)
+        index._use(postings, lengths)
+        return index
+
+    def _use(self, postings, lengths: Sequence[float]):
+        self.postings = postings
+        self.lengths = lengths
+        self.size = len(lengths)
+        self.average_length = sum(lengths) / self.size if self.size else 1.0
+
+    def idf(self, term: str) -> float:
+        matches = len(self.postings.get(term, ()))
+        return math.log(1 + (self.size - matches + 0.5) / (matches + 0.5))
+
+    def matches(self, query: str) -> Set[int]:
+        """Positions of the documents containing at least one query term."""
+        positions = set()
+        for term in set(tokenize(query)):
+            positions.update(position for position, _ in self.postings.get(term, ()))
+        return positions
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every document containing at least one query term."""
+        scores = {}
+        lengths = self.lengths
+        average = self.average_length
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for position, frequency in postings:
+                norm = K1 * (1 - B + B * lengths[position] / average)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+        return scores
+
+    def top_k(self, query: str, k: int, weight: Callable[[int], float] = None,
+              accept: Callable[[int], bool] = None) -> List[Tuple[float, int]]:
+        """
+        The k best (score, position) pairs, best first. `weight` scales a
+        document's score and `accept` drops documents (e.g. other filters).
+        """
+        candidates = (
+            (score * weight(position) if weight else score, -position)
+            for position, score in self.scores(query).items()
+            if accept is None or accept(position)
+        )
+        # Ties go to the earlier position
+        return [(score, -position) for score, position in heapq.nlargest(k, candidates)]
@@ -0,0 +1,60 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight call:
+the first caller (the leader) runs the function, the others wait for
+it and receive the same result or exception. Nothing is cached once
+the call finishes, so the next request after it goes upstream again.
+
+Results are shared between callers and must be treated as read-only.
+"""
+import threading
+from typing import Callable, Dict, Hashable
+
+from .metrics import record_coalesce
+
+
+class _Call:
+    """One in-flight call and its outcome."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """A namespace of coalesced calls, e.g. one per database operation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable):
+        """Run func() for key, or wait for the identical call already running."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        record_coalesce(self.name, leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
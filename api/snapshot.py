@@ -0,0 +1,664 @@
+"""
+Read-only, memory-mapped event snapshots shared across worker processes.
+
+A snapshot file holds the events in timeline order as fixed-width
+columns plus one UTF-8 string heap. Every worker maps the same file, so
+they share its physical pages, and queries read straight from the
+mapped columns; dicts are only built for the rows being returned.
+
+Publish a new snapshot with write_snapshot() (or
+`python -m api.snapshot build <path>`): it is written to a temporary
+file and renamed over the old one, and readers pick it up on their
+next check without a restart.
+
+Each snapshot carries a dataset version, one more than the snapshot it
+replaced, plus the version at which every event last changed and at
+which removed ids disappeared. Every worker reads the same versions,
+so /api/events/changes tokens are valid on any of them. The epoch is
+carried over too, and only changes when a snapshot is written without
+a previous one to continue from.
+
+The derived data queries need is built once, by whoever writes the
+snapshot, and mapped like the rest: the change log in (version, id)
+order, each year's events ranked for the timeline, the BM25 postings
+and the related-events vectors and neighbor lists.
+
+Layout: b"AIONSNP1", u32 metadata length, JSON metadata, then each
+section aligned to 8 bytes at the offset listed in the metadata.
+"""
+import bisect
+import heapq
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .related import RELATED_K, RelatedIndex
+from .search import TermIndex, importance_boost
+
+MAGIC = b"AIONSNP1"
+FORMAT_VERSION = 2
+
+# Fixed-width columns: name -> array typecode
+NUMERIC_COLUMNS = {
+    "id": "q",
+    "year": "h",
+    "month": "b",        # 0 = unknown
+    "day": "b",          # 0 = unknown
+    "importance": "b",
+    "category": "B",     # index into metadata "categories"
+    "nulls": "B",        # bit per nullable string column
+    "version": "q",      # dataset version at which the event last changed
+}
+# Variable-width columns stored in the heap, with count + 1 offsets each
+STRING_COLUMNS = ("title", "description", "source_url", "image_url")
+NULLABLE_STRINGS = ("description", "source_url", "image_url")
+
+
+def _sort_key(event: Dict):
+    return (event.get("year", 0), event.get("month") or 0, event.get("day") or 0)
+
+
+def _comparable(event: Dict) -> Dict:
+    """An event in the shape EventSnapshot.row() returns, for change detection."""
+    row = {
+        "id": event["id"],
+        "year": event.get("year", 0),
+        "title": event.get("title") or "",
+        "category": event.get("category") or "other",
+        "importance": event.get("importance", 3),
+    }
+    if event.get("month"):
+        row["month"] = event["month"]
+    if event.get("day"):
+        row["day"] = event["day"]
+    for name in NULLABLE_STRINGS:
+        if event.get(name) is not None:
+            row[name] = event[name]
+    return row
+
+
+def _previous_snapshot(path: str) -> Optional["EventSnapshot"]:
+    try:
+        return EventSnapshot(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_snapshot(events: List[Dict], path: str, dataset_version: int = None):
+    """
+    Write events (which must carry ids) as a snapshot and atomically
+    replace `path` with it.
+
+    The dataset version defaults to one more than the snapshot being
+    replaced. Events identical to their previous copy keep their version;
+    new and changed ones get the new one, as do ids that disappeared.
+    """
+    previous = _previous_snapshot(path)
+    now = time.time()
+    # Versions only continue the previous snapshot's; otherwise they start a new epoch
+    epoch = previous.epoch if previous is not None else time.time_ns()
+    if dataset_version is None:
+        dataset_version = previous.dataset_version + 1 if previous is not None else 1
+    old_versions = previous.versions() if previous is not None else {}
+    deleted = previous.deleted() if previous is not None else {}
+    for event in events:
+        deleted.pop(event["id"], None)
+    new_ids = {event["id"] for event in events}
+    for old_id in old_versions:
+        if old_id not in new_ids:
+            deleted[old_id] = dataset_version
+
+    events = sorted(events, key=_sort_key)
+    categories = sorted({e.get("category") or "other" for e in events})
+    category_codes = {c: i for i, c in enumerate(categories)}
+
+    columns = {name: array(code) for name, code in NUMERIC_COLUMNS.items()}
+    # Each string column gets its own contiguous region of the heap
+    offsets = {name: array("Q", [0]) for name in STRING_COLUMNS}
+    regions = {name: bytearray() for name in STRING_COLUMNS}
+
+    for event in events:
+        columns["id"].append(event["id"])
+        columns["year"].append(event.get("year", 0))
+        columns["month"].append(event.get("month") or 0)
+        columns["day"].append(event.get("day") or 0)
+        columns["importance"].append(event.get("importance", 3))
+        columns["category"].append(category_codes[event.get("category") or "other"])
+        nulls = 0
+        for name in STRING_COLUMNS:
+            value = event.get(name)
+            if value is None and name in NULLABLE_STRINGS:
+                nulls |= 1 << NULLABLE_STRINGS.index(name)
+            regions[name] += (value or "").encode("utf-8")
+            offsets[name].append(len(regions[name]))
+        columns["nulls"].append(nulls)
+        unchanged = previous is not None and previous.get(event["id"]) == _comparable(event)
+        columns["version"].append(old_versions[event["id"]] if unchanged else dataset_version)
+
+    heap = bytearray()
+    for name in STRING_COLUMNS:
+        base = len(heap)
+        offsets[name] = array("Q", (base + offset for offset in offsets[name]))
+        heap += regions[name]
+
+    # Secondary index for lookups by id
+    id_pos = sorted(range(len(events)), key=lambda i: columns["id"][i])
+    sections = dict(columns)
+    sections.update({f"{name}_offsets": offsets[name] for name in STRING_COLUMNS})
+    sections["id_order"] = array("q", (columns["id"][i] for i in id_pos))
+    sections["id_pos"] = array("I", id_pos)
+    sections["deleted_ids"] = array("q", deleted.keys())
+    sections["deleted_versions"] = array("q", deleted.values())
+    sections.update(_change_log_sections(columns, deleted))
+    # Rows are in year order, so each year's block of rank_pos lines up with its block of rows
+    sections["rank_pos"] = array("I", sorted(range(len(events)), key=lambda i: (
+        columns["year"][i], -columns["importance"][i], columns["month"][i], columns["day"][i], columns["id"][i]
+    )))
+    docs = [(e.get("title") or "", e.get("description")) for e in events]
+    term_index = TermIndex(docs)
+    # Both indexes tokenize the same text, so they share one sorted term list
+    terms = sorted(term_index.postings)
+    sections.update(_term_sections(term_index, terms))
+    sections.update(_related_sections(RelatedIndex(
+        (event_id, title, description) for event_id, (title, description) in zip(columns["id"], docs)
+    ), terms))
+
+    payloads = [(name, data.typecode, data.tobytes()) for name, data in sections.items()]
+    payloads.append(("heap", "B", bytes(heap)))
+
+    # Offsets depend on the metadata length, so lay out twice until stable
+    meta = {}
+    header_len = 0
+    while True:
+        position = _align(len(MAGIC) + 4 + header_len)
+        layout = {}
+        for name, typecode, payload in payloads:
+            layout[name] = [position, typecode, len(payload)]
+            position = _align(position + len(payload))
+        meta = {
+            "format": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "count": len(events),
+            "dataset_version": dataset_version,
+            "epoch": epoch,
+            "created_at": now,
+            "categories": categories,
+            "sections": layout,
+        }
+        encoded = json.dumps(meta).encode()
+        if len(encoded) == header_len:
+            break
+        header_len = len(encoded)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        for name, _, payload in payloads:
+            f.write(b"\0" * (layout[name][0] - f.tell()))
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+def _change_log_sections(columns: Dict[str, array], deleted: Dict[int, int]) -> Dict[str, array]:
+    """(version, id, deleted) entries sorted, as three parallel columns."""
+    log = sorted(itertools.chain(
+        ((version, event_id, 0) for event_id, version in zip(columns["id"], columns["version"])),
+        ((version, event_id, 1) for event_id, version in deleted.items()),
+    ))
+    return {
+        "log_versions": array("q", (entry[0] for entry in log)),
+        "log_ids": array("q", (entry[1] for entry in log)),
+        "log_deleted": array("B", (entry[2] for entry in log)),
+    }
+
+
+def _term_sections(index: TermIndex, terms: List[str]) -> Dict[str, array]:
+    """BM25 postings: sorted terms in their own heap, each with a run of (position, frequency)."""
+    term_heap = bytearray()
+    term_offsets = array("Q", [0])
+    posting_start = array("Q", [0])
+    positions = array("I")
+    frequencies = array("d")
+    for term in terms:
+        term_heap += term.encode("utf-8")
+        term_offsets.append(len(term_heap))
+        for position, frequency in index.postings[term]:
+            positions.append(position)
+            frequencies.append(frequency)
+        posting_start.append(len(positions))
+    return {
+        "term_heap": array("B", term_heap),
+        "term_offsets": term_offsets,
+        "posting_start": posting_start,
+        "posting_positions": positions,
+        "posting_frequencies": frequencies,
+        "doc_lengths": array("d", index.lengths),
+    }
+
+
+def _related_sections(index: RelatedIndex, terms: List[str]) -> Dict[str, array]:
+    """
+    TF-IDF vectors as CSR arrays with a column per sorted term, and the
+    neighbor lists by row position: a run of (event id, similarity) per row.
+    """
+    idf, matrix = index.vectors(terms)
+    related_start = array("Q", [0])
+    related_ids = array("q")
+    related_scores = array("d")
+    for event_id in index.ids:
+        for neighbor, score in index.neighbors[event_id]:
+            related_ids.append(neighbor)
+            related_scores.append(score)
+        related_start.append(len(related_ids))
+    return {
+        "related_start": related_start,
+        "related_ids": related_ids,
+        "related_scores": related_scores,
+        "related_idf": array("d", idf.tobytes()),
+        "related_data": array("d", matrix.data.tobytes()),
+        "related_indices": array("i", matrix.indices.astype(np.int32).tobytes()),
+        "related_indptr": array("i", matrix.indptr.astype(np.int32).tobytes()),
+    }
+
+
+class _MappedTerms:
+    """Term -> rank in the snapshot's sorted terms, which is also its related-vector column."""
+
+    def __init__(self, sections: Dict[str, memoryview]):
+        self._heap = sections["term_heap"]
+        self._offsets = sections["term_offsets"]
+
+    def _term(self, rank: int) -> bytes:
+        return bytes(self._heap[self._offsets[rank]:self._offsets[rank + 1]])
+
+    def get(self, term: str, default=None) -> Optional[int]:
+        # UTF-8 bytes sort like the strings they encode
+        key = term.encode("utf-8")
+        low, high = 0, len(self._offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self._offsets) - 1 or self._term(low) != key:
+            return default
+        return low
+
+
+class _MappedPostings:
+    """The postings mapping TermIndex reads, found through the sorted terms."""
+
+    def __init__(self, terms: _MappedTerms, sections: Dict[str, memoryview]):
+        self._terms = terms
+        self._start = sections["posting_start"]
+        self._positions = sections["posting_positions"]
+        self._frequencies = sections["posting_frequencies"]
+
+    def get(self, term: str, default=None):
+        rank = self._terms.get(term)
+        if rank is None:
+            return default
+        start, end = self._start[rank], self._start[rank + 1]
+        return list(zip(self._positions[start:end], self._frequencies[start:end]))
+
+
+class _MappedNeighbors:
+    """The neighbor lists RelatedIndex reads, by event id."""
+
+    def __init__(self, snapshot: "EventSnapshot"):
+        self._snapshot = snapshot
+
+    def get(self, event_id: int, default=None):
+        neighbors = self._snapshot.related(event_id)
+        return default if neighbors is None else neighbors
+
+
+class EventSnapshot:
+    """A mapped snapshot file. Safe to share between threads."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not an event snapshot")
+        (meta_len,) = struct.unpack("<I", buffer[len(MAGIC):len(MAGIC) + 4])
+        meta = json.loads(bytes(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + meta_len]))
+        if meta["format"] != FORMAT_VERSION or meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} has an incompatible snapshot format")
+
+        self.count = meta["count"]
+        self.dataset_version = meta["dataset_version"]
+        self.epoch = meta["epoch"]
+        self.created_at = meta.get("created_at", 0.0)
+        self.categories = meta["categories"]
+        self._category_codes = {c: i for i, c in enumerate(self.categories)}
+        self._sections = {}
+        for name, (offset, typecode, length) in meta["sections"].items():
+            view = buffer[offset:offset + length]
+            self._sections[name] = view.cast(typecode)
+
+        s = self._sections
+        self.ids, self.years, self.months, self.days = s["id"], s["year"], s["month"], s["day"]
+        self.importance, self.category_col, self.nulls = s["importance"], s["category"], s["nulls"]
+        self._heap = s["heap"]
+        self._offsets = {name: s[f"{name}_offsets"] for name in STRING_COLUMNS}
+        self._term_index = None
+
+    def versions(self) -> Dict[int, int]:
+        """Dataset version at which each event last changed."""
+        return dict(zip(self.ids, self._sections["version"]))
+
+    def deleted(self) -> Dict[int, int]:
+        """Dataset version at which each removed event id disappeared."""
+        return dict(zip(self._sections["deleted_ids"], self._sections["deleted_versions"]))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _string(self, name: str, i: int) -> Optional[str]:
+        if name in NULLABLE_STRINGS and self.nulls[i] & (1 << NULLABLE_STRINGS.index(name)):
+            return None
+        offsets = self._offsets[name]
+        return str(self._heap[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def row(self, i: int) -> Dict:
+        """Materialize row i as an event dict (absent fields are omitted, like demo events)."""
+        event = {
+            "id": self.ids[i],
+            "year": self.years[i],
+            "title": self._string("title", i),
+            "category": self.categories[self.category_col[i]],
+            "importance": self.importance[i],
+        }
+        if self.months[i]:
+            event["month"] = self.months[i]
+        if self.days[i]:
+            event["day"] = self.days[i]
+        for name in NULLABLE_STRINGS:
+            value = self._string(name, i)
+            if value is not None:
+                event[name] = value
+        return event
+
+    def rows(self) -> Iterator[Dict]:
+        return (self.row(i) for i in range(self.count))
+
+    def _position(self, event_id: int) -> Optional[int]:
+        """Row position of an event id, through the sorted id index."""
+        order = self._sections["id_order"]
+        position = bisect.bisect_left(order, event_id)
+        if position < self.count and order[position] == event_id:
+            return self._sections["id_pos"][position]
+        return None
+
+    def get(self, event_id: int) -> Optional[Dict]:
+        """Look up an event by id."""
+        position = self._position(event_id)
+        return self.row(position) if position is not None else None
+
+    def iter_query(
+        self,
+        category: str = None,
+        importance: int = None,
+        year_from: int = None,
+        year_to: int = None,
+        search: str = None
+    ) -> Iterator[Dict]:
+        """Yield matching events in timeline order, filtering on the mapped columns."""
+        return (self.row(i) for i in self._positions(category, importance, year_from, year_to, search))
+
+    def _positions(self, category, importance, year_from, year_to, search, any_term=False) -> Iterator[int]:
+        """
+        Row positions matching the filters, in timeline order. The search
+        matches as a substring, or with any_term like search() does.
+        """
+        # Rows are sorted by year, so the year range is two bisects
+        start = bisect.bisect_left(self.years, year_from) if year_from else 0
+        end = bisect.bisect_right(self.years, year_to) if year_to else self.count
+        code = None
+        if category:
+            code = self._category_codes.get(category)
+            if code is None:
+                return
+        needle = search.lower() if search and not any_term else None
+        matched = self.term_index.matches(search) if search and any_term else None
+
+        for i in range(start, end):
+            if code is not None and self.category_col[i] != code:
+                continue
+            if importance and self.importance[i] < importance:
+                continue
+            if matched is not None and i not in matched:
+                continue
+            if needle and needle not in self._string("title", i).lower() \
+                    and needle not in (self._string("description", i) or "").lower():
+                continue
+            yield i
+
+    def query(self, limit: int = None, **filters) -> List[Dict]:
+        return list(itertools.islice(self.iter_query(**filters), limit))
+
+    def facets(
+        self,
+        category: str = None,
+        importance: int = None,
+        year_from: int = None,
+        year_to: int = None,
+        search: str = None,
+        any_term: bool = False
+    ) -> Dict[str, Dict]:
+        """
+        Counts per category, importance and year, each under all filters
+        but its own. With any_term the search matches like search() does.
+        """
+        positions = lambda *filters: self._positions(*filters, search, any_term)
+        by_category = Counter(self.category_col[i] for i in positions(None, importance, year_from, year_to))
+        by_importance = Counter(self.importance[i] for i in positions(category, None, year_from, year_to))
+        by_year = Counter(self.years[i] for i in positions(category, importance, None, None))
+        return {
+            "category": dict(sorted((self.categories[c], n) for c, n in by_category.items())),
+            "importance": dict(sorted(by_importance.items())),
+            "year": dict(sorted(by_year.items())),
+        }
+
+    @property
+    def term_index(self) -> TermIndex:
+        """BM25 index over the mapped postings; only the query terms' postings are read."""
+        index = self._term_index
+        if index is None:
+            index = self._term_index = TermIndex.from_postings(
+                _MappedPostings(_MappedTerms(self._sections), self._sections), self._sections["doc_lengths"]
+            )
+        return index
+
+    def related_index(self) -> RelatedIndex:
+        """
+        A RelatedIndex over the mapped vectors and neighbor lists, to add
+        events the snapshot doesn't have; each call starts a fresh one.
+        """
+        s = self._sections
+        return RelatedIndex.from_arrays(
+            self.ids, _MappedTerms(s), s["related_idf"],
+            s["related_data"], s["related_indices"], s["related_indptr"], _MappedNeighbors(self)
+        )
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        category: str = None,
+        importance: int = None,
+        year_from: int = None,
+        year_to: int = None
+    ) -> List[Dict]:
+        """Top `limit` events matching any query term, by BM25 score times importance boost."""
+        code = self._category_codes.get(category) if category else None
+        if category and code is None:
+            return []
+
+        def accept(i):
+            return ((code is None or self.category_col[i] == code)
+                    and (not importance or self.importance[i] >= importance)
+                    and (not year_from or self.years[i] >= year_from)
+                    and (not year_to or self.years[i] <= year_to))
+
+        top = self.term_index.top_k(query, limit, weight=lambda i: importance_boost(self.importance[i]),
+                                    accept=accept)
+        return [self.row(i) for _, i in top]
+
+    def timeline(self, year_from: int, year_to: int, width: int, per_bucket: int) -> List[Dict]:
+        """Non-empty buckets of `width` years with their `per_bucket` most important events."""
+        rank_pos = self._sections["rank_pos"]
+        rank_key = lambda i: (-self.importance[i], self.years[i], self.months[i], self.days[i], self.ids[i])
+        buckets = []
+        for start in range(year_from, year_to + 1, width):
+            end = min(start + width - 1, year_to)
+            low = bisect.bisect_left(self.years, start)
+            high = bisect.bisect_right(self.years, end)
+            if low == high:
+                continue
+            # Each year's block is already ranked, so only its head can make the top-k
+            heads = []
+            block = low
+            while block < high:
+                block_end = bisect.bisect_right(self.years, self.years[block], block, high)
+                heads.append(rank_pos[block:min(block_end, block + per_bucket)])
+                block = block_end
+            top = list(itertools.islice(heapq.merge(*heads, key=rank_key), per_bucket))
+            buckets.append({
+                "start": start,
+                "end": end,
+                "events": [self.row(i) for i in top],
+                "total": high - low,
+                "hidden": high - low - len(top)
+            })
+        return buckets
+
+    def changes(self, since_version: int, last_id: int, limit: int) -> Tuple[List[tuple], bool]:
+        """
+        Up to `limit` (version, event_id, deleted) entries after a sync
+        position, in (version, id) order, and whether more follow.
+        """
+        versions = self._sections["log_versions"]
+        ids = self._sections["log_ids"]
+        gone = self._sections["log_deleted"]
+        start = bisect.bisect_right(
+            ids, last_id,
+            bisect.bisect_left(versions, since_version), bisect.bisect_right(versions, since_version)
+        )
+        end = min(start + limit, len(versions))
+        return [(versions[i], ids[i], bool(gone[i])) for i in range(start, end)], end < len(versions)
+
+    def related(self, event_id: int, limit: int = RELATED_K) -> Optional[List[Tuple[int, float]]]:
+        """(event_id, similarity) pairs, most similar first; None for an unknown event."""
+        position = self._position(event_id)
+        if position is None:
+            return None
+        start = self._sections["related_start"][position]
+        end = min(self._sections["related_start"][position + 1], start + limit)
+        return list(zip(self._sections["related_ids"][start:end], self._sections["related_scores"][start:end]))
+
+    def stats(self) -> Dict:
+        """Counts by year and category, computed from the columns alone."""
+        years = Counter(self.years)
+        categories = Counter(self.category_col)
+        return {
+            "total_events": self.count,
+            "events_by_year": dict(sorted(years.items())),
+            "events_by_category": {self.categories[c]: n for c, n in categories.items()},
+            "year_range": {
+                "min": self.years[0] if self.count else None,
+                "max": self.years[self.count - 1] if self.count else None
+            }
+        }
+
+
+class SnapshotManager:
+    """
+    Keeps the current mapping of a snapshot path and remaps it when the
+    file is replaced. Old mappings stay valid for readers still using them.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._identity = None
+        self._checked_at = 0.0
+
+    def current(self, force: bool = False) -> Optional[EventSnapshot]:
+        """The current mapping; the file is re-checked at most every check_interval unless forced."""
+        now = time.monotonic()
+        if not force and self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return self._snapshot
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if identity != self._identity:
+                self._snapshot = EventSnapshot(self.path)
+                self._identity = identity
+            return self._snapshot
+
+
+def main():
+    """Build a snapshot: python -m api.snapshot build <path> [--source FILE | --from-db]"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build a memory-mapped event snapshot")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write a snapshot file")
+    build.add_argument("path", help="Snapshot file to (atomically) replace")
+    build.add_argument("--source", help="JSON list of events (default: data/raw/all_events.json "
+                                        "if present, else the curated events)")
+    build.add_argument("--from-db", action="store_true",
+                       help="Export the configured database instead, e.g. as the fallback "
+                            "used when Supabase is slow or down")
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source = args.source or os.path.join(base_dir, "data", "raw", "all_events.json")
+    if args.from_db:
+        sys.path.insert(0, base_dir)
+        from api.database import iter_events
+        events = list(iter_events())
+    elif os.path.exists(source):
+        with open(source, encoding="utf-8") as f:
+            events = json.load(f)
+    else:
+        sys.path.insert(0, base_dir)
+        from scraper.sources import ESSENTIAL_EVENTS
+        events = ESSENTIAL_EVENTS
+    events = [dict(e, id=e.get("id") or i + 1) for i, e in enumerate(events)]
+
+    write_snapshot(events, args.path)
+    print(f"Wrote {len(events)} events to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmark suite for the API query engine and the scraper.
+
+Times the hot paths (get_all_events, get_event_stats,
+scrape_wikipedia_timeline, merge_with_essential_events) on synthetic
+data at several scales and writes the results to a JSON file.
+
+Usage:
+    python -m benchmarks.bench                          # default scales
+    python -m benchmarks.bench --scales 1x,10000,1000000
+    python -m benchmarks.bench --save-baseline          # store as baseline
+    python -m benchmarks.bench --check                  # fail on regressions
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from api import database as db
+from scraper import scraper
+from scraper.sources import ESSENTIAL_EVENTS
+from benchmarks.synthetic import generate_events, generate_scraped_events, generate_timeline_html
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+DEFAULT_SCALES = "1x,10000,100000"
+
+# Representative /api/events filter combinations
+QUERY_CASES = {
+    "all": {},
+    "category": {"category": "model"},
+    "importance": {"importance": 4},
+    "year_range": {"year_from": 1990, "year_to": 2010},
+    "search": {"search": "neural"},
+    "ranked_search": {"search": "neural network", "rank": "relevance"},
+    "combined": {"category": "research", "importance": 3, "year_from": 2000, "search": "learning"},
+}
+
+
+def parse_scales(value: str) -> List[int]:
+    """Parse '1x,10000' into event counts; '1x' is len(ESSENTIAL_EVENTS)."""
+    scales = []
+    for part in value.split(","):
+        part = part.strip().lower()
+        if part.endswith("x"):
+            scales.append(int(float(part[:-1]) * len(ESSENTIAL_EVENTS)))
+        elif part:
+            scales.append(int(part))
+    return scales
+
+
+def time_case(func: Callable, repeat: int) -> Dict:
+    """Run func `repeat` times (after one warm-up) and summarize the timings."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+        "repeat": repeat
+    }
+
+
+def _repeat_for(scale: int, base: int) -> int:
+    # Fewer repetitions for large corpora so the suite stays practical
+    return max(3, min(base, int(base * 10000 / max(scale, 1))))
+
+
+def bench_query_engine(scale: int, repeat: int) -> Dict[str, Dict]:
+    """Time get_all_events and get_event_stats on a synthetic corpus."""
+    db.DEMO_MODE = True
+    db.replace_demo_events(generate_events(scale))
+    results = {}
+    for name, filters in QUERY_CASES.items():
+        results[f"get_all_events[{name}]"] = time_case(
+            lambda: db.get_all_events(limit=1000, **filters), _repeat_for(scale, repeat)
+        )
+    results["get_event_stats"] = time_case(db.get_event_stats, _repeat_for(scale, repeat))
+    return results
+
+
+def bench_scraper(scale: int, repeat: int) -> Dict[str, Dict]:
+    """Time page extraction and merging on synthetic scraper inputs."""
+    results = {}
+    # HTML parsing is far slower per row, so pages are capped at a realistic size
+    rows = min(scale, 20000)
+    html = generate_timeline_html(rows)
+    original_fetch = scraper.fetch_page
+    scraper.fetch_page = lambda url: BeautifulSoup(html, "html5lib")
+    try:
+        results[f"scrape_wikipedia_timeline[{rows}_rows]"] = time_case(
+            lambda: scraper.scrape_wikipedia_timeline("https://example.org/timeline"),
+            _repeat_for(rows * 20, repeat)
+        )
+    finally:
+        scraper.fetch_page = original_fetch
+
+    scraped = generate_scraped_events(scale)
+    results["merge_with_essential_events"] = time_case(
+        lambda: scraper.merge_with_essential_events(scraped), _repeat_for(scale, repeat)
+    )
+    return results
+
+
+def run_suite(scales: List[int], repeat: int, include_scraper: bool = True) -> Dict:
+    """Run every benchmark at every scale."""
+    results = {}
+    for scale in scales:
+        print(f"Scale {scale:,} events")
+        cases = bench_query_engine(scale, repeat)
+        if include_scraper:
+            cases.update(bench_scraper(scale, repeat))
+        for name, timing in cases.items():
+            key = f"{name}@{scale}"
+            results[key] = timing
+            print(f"  {name:<45} median {timing['median'] * 1000:10.3f} ms")
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results
+    }
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Return a message for every case slower than baseline by more than threshold."""
+    regressions = []
+    for key, timing in report["results"].items():
+        reference = baseline.get("results", {}).get(key)
+        if not reference:
+            continue
+        limit = reference["median"] * (1 + threshold)
+        if timing["median"] > limit:
+            change = (timing["median"] / reference["median"] - 1) * 100
+            regressions.append(
+                f"{key}: {timing['median'] * 1000:.3f} ms vs baseline "
+                f"{reference['median'] * 1000:.3f} ms (+{change:.0f}%)"
+            )
+    return regressions
+
+
+def save_json(data: Dict, filepath: str):
+    """Write a report to disk."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"Saved results to {filepath}")
+
+
+def main():
+    """Entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the AIONOS query engine and scraper")
+    parser.add_argument("--scales", default=DEFAULT_SCALES,
+                        help="Comma-separated corpus sizes; '1x' = ESSENTIAL_EVENTS (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case at small scales")
+    parser.add_argument("--skip-scraper", action="store_true", help="Only benchmark the query engine")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if a case regressed")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown vs baseline before --check fails (default: %(default)s)")
+    args = parser.parse_args()
+
+    report = run_suite(parse_scales(args.scales), args.repeat, not args.skip_scraper)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    save_json(report, output)
+    if args.save_baseline:
+        save_json(report, args.baseline)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            sys.exit(2)
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
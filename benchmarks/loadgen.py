@@ -0,0 +1,162 @@
+"""
+Load generator for the AIONOS API.
+
+Drives /api/events, /api/stats and /api/events/{id} at a fixed
+concurrency and reports throughput and latency percentiles.
+
+Usage:
+    python -m benchmarks.loadgen --concurrency 64 --duration 30
+    python -m benchmarks.loadgen --mix events=1 --requests 5000 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench import QUERY_CASES
+
+DEFAULT_MIX = "events=6,stats=2,event=2"
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'events=6,stats=2' into endpoint weights."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("events", "stats", "event"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}' in mix")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def build_request(kind: str, rng: random.Random, max_id: int):
+    """Return (label, path, params) for one request of the given kind."""
+    if kind == "events":
+        case = rng.choice(sorted(QUERY_CASES))
+        return f"/api/events[{case}]", "/api/events", QUERY_CASES[case]
+    if kind == "stats":
+        return "/api/stats", "/api/stats", {}
+    return "/api/events/{id}", f"/api/events/{rng.randint(1, max_id)}", {}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+
+async def run_load(base_url: str, concurrency: int, duration: float, total: int,
+                   mix: Dict[str, float], max_id: int, seed: int, timeout: float) -> Dict:
+    """Run the load test and return overall and per-endpoint summaries."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+
+        async def worker():
+            nonlocal issued
+            while True:
+                if (total and issued >= total) or (deadline and time.perf_counter() >= deadline):
+                    return
+                issued += 1
+                label, path, params = build_request(rng.choices(kinds, weights)[0], rng, max_id)
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params)
+                    await response.aread()
+                    failed = response.status_code >= 500
+                except httpx.HTTPError:
+                    failed = True
+                latencies.setdefault(label, []).append(time.perf_counter() - start)
+                if failed:
+                    errors[label] = errors.get(label, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "overall": summarize(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": {
+            label: summarize(values, errors.get(label, 0), elapsed)
+            for label, values in sorted(latencies.items())
+        },
+    }
+
+
+def print_report(report: Dict):
+    print(f"\n{report['base_url']}  concurrency={report['concurrency']}  "
+          f"elapsed={report['elapsed_s']:.1f}s")
+    header = f"{'endpoint':<32}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["overall"])]
+    for label, s in rows:
+        print(f"{label:<32}{s['requests']:>8}{s['errors']:>8}{s['throughput_rps']:>10.1f}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}")
+
+
+def main():
+    """Entry point."""
+    parser = argparse.ArgumentParser(description="Load test the AIONOS API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (0 = use --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help="Endpoint weights (default: %s)" % DEFAULT_MIX)
+    parser.add_argument("--max-id", type=int, default=50, help="Highest event id for /api/events/{id}")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for a reproducible request mix")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+
+    report = asyncio.run(run_load(
+        args.base_url, args.concurrency, args.duration, args.requests,
+        args.mix, args.max_id, args.seed, args.timeout
+    ))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Local PostgREST-compatible stand-in for load testing the Supabase path.
+
+Serves the `events` table from memory with the subset of the PostgREST
+API that api.database uses (select, filters, or/and trees, order, limit,
+offset, single-object responses, inserts and the RPC functions from
+database_schema.sql), with configurable injected latency.
+
+Usage:
+    python -m benchmarks.postgrest_stub --events 100000 --latency-ms 20
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=local.stub.key python run.py
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_events
+
+COLUMNS = [
+    "id", "title", "description", "year", "month", "day", "category",
+    "importance", "source_url", "image_url", "created_at", "updated_at"
+]
+
+# Key accepted by supabase.create_client (it only checks the JWT shape)
+STUB_KEY = "local.stub.key"
+
+
+class StubError(Exception):
+    """A PostgREST-style error response."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class EventTable:
+    """In-memory `events` table."""
+
+    def __init__(self, events: List[Dict]):
+        self.lock = threading.Lock()
+        self.rows = []
+        self.next_id = 1
+        self.insert(events)
+
+    def insert(self, events: List[Dict]) -> List[Dict]:
+        inserted = []
+        with self.lock:
+            for event in events:
+                row = {column: event.get(column) for column in COLUMNS}
+                if row["id"] is None:
+                    row["id"] = self.next_id
+                self.next_id = max(self.next_id, row["id"]) + 1
+                row["importance"] = row["importance"] or 3
+                row["created_at"] = row["updated_at"] = _now()
+                self.rows.append(row)
+                inserted.append(row)
+        return inserted
+
+
+# ============================================
+# Filter parsing
+# ============================================
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a logic tree body on commas that are not nested or quoted."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _coerce(value: str, sample):
+    """Convert a filter literal to the type of the column value it is compared with."""
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, int):
+        return int(value)
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def _compare(row_value, op: str, raw: str) -> bool:
+    if op == "is":
+        if raw == "null":
+            return row_value is None
+        return row_value is (raw == "true")
+    if row_value is None:
+        return False
+    if op in ("like", "ilike"):
+        pattern = re.escape(raw).replace("\\*", ".*").replace("%", ".*")
+        flags = re.IGNORECASE | re.DOTALL if op == "ilike" else re.DOTALL
+        return re.fullmatch(pattern, str(row_value), flags) is not None
+    if op == "in":
+        values = [_coerce(_unquote(v), row_value) for v in _split_top_level(raw.strip("()"))]
+        return row_value in values
+    if raw in ("-infinity", "infinity"):
+        value_cmp = -1 if raw == "infinity" else 1
+    else:
+        value = _coerce(raw, row_value)
+        value_cmp = (row_value > value) - (row_value < value)
+    return {
+        "eq": value_cmp == 0, "neq": value_cmp != 0,
+        "gt": value_cmp > 0, "gte": value_cmp >= 0,
+        "lt": value_cmp < 0, "lte": value_cmp <= 0,
+    }[op]
+
+
+def parse_condition(text: str) -> Callable[[Dict], bool]:
+    """Parse `col.op.value`, `and(...)` or `or(...)` into a row predicate."""
+    for logic, combine in (("and(", all), ("or(", any)):
+        if text.startswith(logic) and text.endswith(")"):
+            children = [parse_condition(p) for p in _split_top_level(text[len(logic):-1])]
+            return lambda row: combine(child(row) for child in children)
+    negate = False
+    column, _, rest = text.partition(".")
+    if rest.startswith("not."):
+        negate, rest = True, rest[4:]
+    op, _, raw = rest.partition(".")
+    raw = _unquote(raw)
+    if column not in COLUMNS:
+        raise StubError(400, f"column events.{column} does not exist")
+    return lambda row: _compare(row.get(column), op, raw) != negate
+
+
+def parse_filter(key: str, value: str) -> Callable[[Dict], bool]:
+    """Parse one query-string filter into a row predicate."""
+    if key in ("or", "and"):
+        return parse_condition(f"{key}{value}")
+    return parse_condition(f"{key}.{value}")
+
+
+def _sort_rows(rows: List[Dict], orders: List[str]) -> List[Dict]:
+    # Stable sorts applied from the last key to the first
+    for spec in reversed(orders):
+        parts = spec.split(".")
+        column, desc = parts[0], "desc" in parts[1:]
+        nulls_first = "nullsfirst" in parts[1:] or (desc and "nullslast" not in parts[1:])
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+# ============================================
+# RPC functions (mirroring database_schema.sql)
+# ============================================
+
+def _rank_key(row: Dict):
+    return (-row["importance"], row["year"], row["month"] or 0, row["day"] or 0, row["id"])
+
+
+def rpc_timeline_buckets(rows: List[Dict], p_year_from: int, p_year_to: int,
+                         p_width: int, p_k: int) -> List[Dict]:
+    buckets = {}
+    for row in rows:
+        if p_year_from <= row["year"] <= p_year_to:
+            start = p_year_from + ((row["year"] - p_year_from) // p_width) * p_width
+            buckets.setdefault(start, []).append(row)
+    result = []
+    for start in sorted(buckets):
+        ranked = sorted(buckets[start], key=_rank_key)
+        for row in ranked[:p_k]:
+            result.append({"bucket_start": start, "bucket_total": len(ranked), "event": row})
+    return result
+
+
+def _terms(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def rpc_event_facets(rows: List[Dict], p_category: str, p_importance: int, p_year_from: int,
+                     p_year_to: int, p_search: str, p_any_term: bool = False) -> List[Dict]:
+    if p_search and p_any_term:
+        # Same matches as search_events
+        terms = set(_terms(p_search))
+        rows = [r for r in rows if terms.intersection(_terms(r["title"]) + _terms(r["description"]))]
+    elif p_search:
+        needle = p_search.lower()
+        rows = [r for r in rows if needle in r["title"].lower() or needle in (r["description"] or "").lower()]
+    tests = {
+        "category": lambda r: p_category is None or r["category"] == p_category,
+        "importance": lambda r: p_importance is None or r["importance"] >= p_importance,
+        "year": lambda r: (p_year_from is None or r["year"] >= p_year_from)
+                          and (p_year_to is None or r["year"] <= p_year_to),
+    }
+    result = []
+    for facet in tests:
+        counts = {}
+        for row in rows:
+            if all(test(row) for other, test in tests.items() if other != facet):
+                counts[row[facet]] = counts.get(row[facet], 0) + 1
+        result.extend({"facet": facet, "value": str(v), "total": n} for v, n in counts.items())
+    return result
+
+
+def rpc_search_events(rows: List[Dict], p_query: str, p_category: str, p_importance: int,
+                      p_year_from: int, p_year_to: int, p_limit: int) -> List[Dict]:
+    # Term counts stand in for ts_rank_cd; enough to exercise the ranked path
+    terms = set(_terms(p_query))
+    scored = []
+    for row in rows:
+        if ((p_category and row["category"] != p_category)
+                or (p_importance and row["importance"] < p_importance)
+                or (p_year_from and row["year"] < p_year_from)
+                or (p_year_to and row["year"] > p_year_to)):
+            continue
+        title = _terms(row["title"])
+        description = _terms(row["description"])
+        score = sum(2 * title.count(t) + description.count(t) for t in terms)
+        if score:
+            scored.append((-score * (1 + 0.1 * (row["importance"] - 1)), row["id"], row))
+    scored.sort(key=lambda item: item[:2])
+    return [row for _, _, row in scored[:p_limit]]
+
+
+RPC_FUNCTIONS = {
+    "timeline_buckets": rpc_timeline_buckets,
+    "event_facets": rpc_event_facets,
+    "search_events": rpc_search_events,
+}
+
+
+# ============================================
+# HTTP server
+# ============================================
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles /rest/v1/events and /rest/v1/rpc/<function> requests."""
+
+    table: EventTable = None
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+    def _delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            raise StubError(503, "Injected failure")
+
+    def _send(self, status: int, body, headers: Dict = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, method: str):
+        # The client sends a body even with GET; drain it to keep the connection in sync
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        try:
+            self._delay()
+            url = urlsplit(self.path)
+            if url.path.startswith("/rest/v1/rpc/"):
+                self._rpc(url.path.rsplit("/", 1)[-1])
+            elif url.path == "/rest/v1/events":
+                if method == "GET":
+                    self._select(parse_qsl(url.query, keep_blank_values=True))
+                else:
+                    self._insert()
+            else:
+                raise StubError(404, f"Unknown path {url.path}")
+        except StubError as e:
+            self._send(e.status, {"message": e.message, "code": str(e.status), "details": None, "hint": None})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"message": str(e), "code": "400", "details": None, "hint": None})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _select(self, params):
+        select, orders, limit, offset, predicates = "*", [], None, 0, []
+        for key, value in params:
+            if key == "select":
+                select = value
+            elif key == "order":
+                orders.extend(value.split(","))
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            else:
+                predicates.append(parse_filter(key, value))
+
+        with self.table.lock:
+            rows = [r for r in self.table.rows if all(p(r) for p in predicates)]
+        total = len(rows)
+        rows = _sort_rows(rows, orders)
+        rows = rows[offset:offset + limit if limit is not None else None]
+        if select.strip() != "*":
+            columns = [c.strip() for c in select.split(",")]
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+
+        headers = {"Content-Range": f"{offset}-{offset + len(rows) - 1}/{total}"}
+        if "vnd.pgrst.object" in self.headers.get("Accept", ""):
+            if len(rows) != 1:
+                raise StubError(406, "JSON object requested, multiple (or no) rows returned")
+            self._send(200, rows[0], headers)
+        else:
+            self._send(200, rows, headers)
+
+    def _insert(self):
+        body = json.loads(self.body or b"null")
+        inserted = self.table.insert(body if isinstance(body, list) else [body])
+        self._send(201, inserted)
+
+    def _rpc(self, name: str):
+        function = RPC_FUNCTIONS.get(name)
+        if function is None:
+            raise StubError(404, f"Could not find the function public.{name}")
+        with self.table.lock:
+            rows = list(self.table.rows)
+        self._send(200, function(rows, **json.loads(self.body or b"{}")))
+
+
+def make_server(host: str, port: int, events: List[Dict], latency_ms: float = 0,
+                jitter_ms: float = 0, error_rate: float = 0) -> ThreadingHTTPServer:
+    """Create (but don't start) a stub server serving `events`."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "table": EventTable(events),
+        "latency": latency_ms / 1000,
+        "jitter": jitter_ms / 1000,
+        "error_rate": error_rate,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """Entry point."""
+    parser = argparse.ArgumentParser(description="Local PostgREST stand-in for the events table")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--events", type=int, default=10000, help="Synthetic events to serve")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Injected latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests failing with 503")
+    args = parser.parse_args()
+
+    events = generate_events(args.events)
+    for event in events:
+        event.pop("id")
+    server = make_server(args.host, args.port, events, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"PostgREST stand-in serving {len(events):,} events on http://{args.host}:{args.port}")
+    print(f"  SUPABASE_URL=http://{args.host}:{args.port} SUPABASE_KEY={STUB_KEY}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Synthetic datasets for benchmarks.
+Event corpora are scaled up from ESSENTIAL_EVENTS and HTML fixtures
+mimic the Wikipedia timeline pages the scraper parses.
+"""
+import random
+import re
+import sys
+import os
+from typing import List, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper.sources import ESSENTIAL_EVENTS, CATEGORY_KEYWORDS
+
+CATEGORIES = ["research", "model", "company", "product", "hardware", "regulation", "milestone", "other"]
+
+# Vocabulary drawn from the curated events, so search terms hit realistically
+VOCABULARY = sorted({
+    word for event in ESSENTIAL_EVENTS
+    for word in re.findall(r"[A-Za-z][A-Za-z-]{2,}", event["title"] + " " + event["description"])
+} | {keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords})
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize()
+
+
+def generate_events(count: int, seed: int = 42) -> List[Dict]:
+    """
+    Generate `count` events shaped like ESSENTIAL_EVENTS, with ids.
+    The curated events come first, so small scales stay realistic.
+    """
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        if i < len(ESSENTIAL_EVENTS):
+            event = dict(ESSENTIAL_EVENTS[i])
+        else:
+            template = ESSENTIAL_EVENTS[i % len(ESSENTIAL_EVENTS)]
+            event = {
+                "year": rng.randint(1950, 2030),
+                "title": f"{template['title']} {_sentence(rng, 3)}"[:150],
+                "description": f"{_sentence(rng, rng.randint(12, 30))}.",
+                "category": rng.choice(CATEGORIES),
+                "importance": rng.choices([1, 2, 3, 4, 5], weights=[10, 25, 35, 20, 10])[0]
+            }
+            # Keep the key shapes of the curated data: month/day are often absent
+            if rng.random() < 0.6:
+                event["month"] = rng.randint(1, 12)
+                if rng.random() < 0.3:
+                    event["day"] = rng.randint(1, 28)
+            if rng.random() < 0.5:
+                event["source_url"] = f"https://en.wikipedia.org/wiki/Synthetic_{i % 997}"
+        event["id"] = i + 1
+        events.append(event)
+    return events
+
+
+def generate_scraped_events(count: int, seed: int = 7) -> List[Dict]:
+    """Generate events shaped like scraper output (no ids, source_url set)."""
+    events = generate_events(count + len(ESSENTIAL_EVENTS), seed)[len(ESSENTIAL_EVENTS):]
+    for event in events:
+        event.pop("id")
+        event.setdefault("source_url", "https://en.wikipedia.org/wiki/Timeline_of_artificial_intelligence")
+    # Some scraped rows duplicate curated ones, as real pages do
+    for event, essential in zip(events[::20], ESSENTIAL_EVENTS):
+        event["year"] = essential["year"]
+        event["title"] = essential["title"]
+    return events
+
+
+def generate_timeline_html(rows: int, seed: int = 3) -> str:
+    """
+    Build a Wikipedia-like page with `rows` timeline entries, split
+    between wikitable rows and dl/dt/dd year lists.
+    """
+    rng = random.Random(seed)
+    table_rows = []
+    dl_items = []
+    year = 1950
+    for i in range(rows):
+        if rng.random() < 0.3:
+            year = min(2030, year + rng.randint(0, 2))
+        text = f"{_sentence(rng, rng.randint(8, 25))}. {_sentence(rng, rng.randint(5, 15))}."
+        if i % 4 == 3:
+            dl_items.append(f"<dt>{year}</dt><dd>{text}</dd>")
+        else:
+            table_rows.append(f"<tr><td>{year}</td><td><a href=\"/wiki/X\">{text}</a></td></tr>")
+
+    tables = []
+    for i in range(0, len(table_rows), 200):
+        tables.append(
+            '<table class="wikitable"><tr><th>Year</th><th>Event</th></tr>'
+            + "".join(table_rows[i:i + 200]) + "</table>"
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Timeline</title></head><body>"
+        "<div id=\"content\"><p>Synthetic timeline fixture.</p>"
+        + "".join(tables)
+        + "<dl>" + "".join(dl_items) + "</dl>"
+        + "</div></body></html>"
+    )
@@ -20,6 +20,10 @@ CREATE TABLE IF NOT EXISTS events (
 -- Create index on year for faster queries
 CREATE INDEX IF NOT EXISTS idx_events_year ON events(year);
 CREATE INDEX IF NOT EXISTS idx_events_category ON events(category);
+-- Per-year importance ranking used by the level-of-detail timeline
+CREATE INDEX IF NOT EXISTS idx_events_year_importance ON events(year, importance DESC);
+-- Keyset index for incremental sync (/api/events/changes)
+CREATE INDEX IF NOT EXISTS idx_events_updated_at ON events(updated_at, id);
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE events ENABLE ROW LEVEL SECURITY;
@@ -56,3 +60,87 @@ CREATE TRIGGER update_events_updated_at
     BEFORE UPDATE ON events
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
+
+-- Level-of-detail timeline: top-k events per year bucket plus bucket totals
+-- Called by /api/timeline through supabase.rpc("timeline_buckets", ...)
+CREATE OR REPLACE FUNCTION timeline_buckets(p_year_from INTEGER, p_year_to INTEGER, p_width INTEGER, p_k INTEGER)
+RETURNS TABLE (bucket_start INTEGER, bucket_total BIGINT, event JSONB)
+LANGUAGE sql STABLE AS $$
+    SELECT ranked.bucket_start, ranked.bucket_total, ranked.event
+    FROM (
+        SELECT
+            p_year_from + ((e.year - p_year_from) / p_width) * p_width AS bucket_start,
+            COUNT(*) OVER w AS bucket_total,
+            ROW_NUMBER() OVER (w ORDER BY e.importance DESC, e.year, e.month NULLS FIRST, e.day NULLS FIRST, e.id) AS rank,
+            to_jsonb(e) AS event
+        FROM events e
+        WHERE e.year BETWEEN p_year_from AND p_year_to
+        WINDOW w AS (PARTITION BY (e.year - p_year_from) / p_width)
+    ) ranked
+    WHERE ranked.rank <= p_k
+    ORDER BY ranked.bucket_start, ranked.rank;
+$$;
+
+-- Weighted full-text document: title (A) ranks above description (B)
+CREATE INDEX IF NOT EXISTS idx_events_search ON events USING GIN ((
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B')
+));
+
+-- Relevance-ranked search for /api/events?rank=relevance through supabase.rpc("search_events", ...)
+-- Matches any query term, scored by ts_rank_cd (length-normalized) times an importance boost
+CREATE OR REPLACE FUNCTION search_events(
+    p_query TEXT, p_category TEXT, p_importance INTEGER, p_year_from INTEGER, p_year_to INTEGER, p_limit INTEGER
+)
+RETURNS SETOF events
+LANGUAGE sql STABLE AS $$
+    SELECT e.*
+    FROM events e,
+         replace(plainto_tsquery('english', p_query)::TEXT, ' & ', ' | ')::tsquery AS q
+    WHERE (setweight(to_tsvector('english', coalesce(e.title, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(e.description, '')), 'B')) @@ q
+      AND (p_category IS NULL OR e.category = p_category)
+      AND (p_importance IS NULL OR e.importance >= p_importance)
+      AND (p_year_from IS NULL OR e.year >= p_year_from)
+      AND (p_year_to IS NULL OR e.year <= p_year_to)
+    ORDER BY ts_rank_cd(
+        setweight(to_tsvector('english', coalesce(e.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(e.description, '')), 'B'),
+        q, 1
+    ) * (1 + 0.1 * (e.importance - 1)) DESC, e.id
+    LIMIT p_limit;
+$$;
+
+-- Facet counts for /api/events?facets=true through supabase.rpc("event_facets", ...)
+-- Each facet is counted under every active filter except its own (NULL = no filter).
+-- p_search matches as a substring, or with p_any_term on any term like search_events
+DROP FUNCTION IF EXISTS event_facets(TEXT, INTEGER, INTEGER, INTEGER, TEXT);
+CREATE OR REPLACE FUNCTION event_facets(
+    p_category TEXT, p_importance INTEGER, p_year_from INTEGER, p_year_to INTEGER, p_search TEXT,
+    p_any_term BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (facet TEXT, value TEXT, total BIGINT)
+LANGUAGE sql STABLE AS $$
+    WITH matched AS (
+        SELECT
+            e.category,
+            e.importance,
+            e.year,
+            (p_category IS NULL OR e.category = p_category) AS in_category,
+            (p_importance IS NULL OR e.importance >= p_importance) AS in_importance,
+            (p_year_from IS NULL OR e.year >= p_year_from) AND (p_year_to IS NULL OR e.year <= p_year_to) AS in_years
+        FROM events e
+        WHERE p_search IS NULL
+           OR (p_any_term AND
+               (setweight(to_tsvector('english', coalesce(e.title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(e.description, '')), 'B'))
+               @@ replace(plainto_tsquery('english', p_search)::TEXT, ' & ', ' | ')::tsquery)
+           OR (NOT p_any_term AND (e.title ILIKE '%' || p_search || '%'
+                                   OR e.description ILIKE '%' || p_search || '%'))
+    )
+    SELECT 'category', m.category, COUNT(*) FROM matched m WHERE m.in_importance AND m.in_years GROUP BY m.category
+    UNION ALL
+    SELECT 'importance', m.importance::TEXT, COUNT(*) FROM matched m WHERE m.in_category AND m.in_years GROUP BY m.importance
+    UNION ALL
+    SELECT 'year', m.year::TEXT, COUNT(*) FROM matched m WHERE m.in_category AND m.in_importance GROUP BY m.year;
+$$;
@@ -1,13 +1,114 @@
 """
 AI Evolution Atlas - Entry Point
 Run this file to start the FastAPI server.
+
+    python run.py           # development: one process, auto-reload
+    python run.py --prod    # production: one worker per core, no reload
+
+Production settings can also come from the environment (see .env.example).
 """
+import argparse
+import importlib.util
+import os
+
 import uvicorn
+from dotenv import load_dotenv
+
+# Where multiple workers share their data and indexes by default
+DEFAULT_SNAPSHOT_PATH = os.path.join("data", "events.snapshot")
+
+
+def _env_int(name: str, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def cpu_count() -> int:
+    """Cores available to this process (respects CPU affinity/cgroup pinning)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def share_snapshot(workers: int):
+    """
+    Demo-mode background refreshes keep their data in each process, so
+    with several workers each would scrape on its own and serve its own
+    dataset; with Supabase each would build its own related-events
+    index. Unless a snapshot is configured, give them one to share: one
+    worker publishes it and all of them map it.
+    """
+    refreshing = float(os.getenv("AIONOS_REFRESH_INTERVAL") or 0) > 0
+    demo = not (os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY"))
+    if workers > 1 and (refreshing or not demo) and not os.getenv("AIONOS_SNAPSHOT_PATH"):
+        # Inherited by the worker processes
+        os.environ["AIONOS_SNAPSHOT_PATH"] = DEFAULT_SNAPSHOT_PATH
+        print(f"{workers} workers: sharing data through {DEFAULT_SNAPSHOT_PATH}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the AIONOS API server")
+    parser.add_argument("--prod", action="store_true",
+                        default=os.getenv("AIONOS_ENV", "").lower() == "production",
+                        help="Production mode (also AIONOS_ENV=production)")
+    parser.add_argument("--host", default=os.getenv("AIONOS_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=_env_int("PORT", 8000))
+    parser.add_argument("--workers", type=int, default=_env_int("WEB_CONCURRENCY"),
+                        help="Worker processes (default: one per CPU core in production)")
+    parser.add_argument("--reload", action="store_true", default=None,
+                        help="Auto-reload on code changes (default: on in development only)")
+    parser.add_argument("--keep-alive", type=int, default=_env_int("AIONOS_KEEP_ALIVE", 5),
+                        help="Seconds to keep idle connections open")
+    parser.add_argument("--backlog", type=int, default=_env_int("AIONOS_BACKLOG", 2048),
+                        help="Pending connection queue size")
+    parser.add_argument("--limit-concurrency", type=int, default=_env_int("AIONOS_LIMIT_CONCURRENCY"),
+                        help="Max concurrent connections per worker before returning 503")
+    parser.add_argument("--graceful-timeout", type=int, default=_env_int("AIONOS_GRACEFUL_TIMEOUT", 30),
+                        help="Seconds to let in-flight requests finish on shutdown")
+    return parser.parse_args()
+
+
+def main():
+    """Entry point."""
+    load_dotenv()
+    args = parse_args()
+
+    if not args.prod:
+        uvicorn.run(
+            "api.main:app",
+            host=args.host,
+            port=args.port,
+            reload=True if args.reload is None else args.reload  # Auto-reload on code changes
+        )
+        return
+
+    reload = bool(args.reload)
+    workers = 1 if reload else (args.workers or cpu_count())
+    loop = "uvloop" if _has_module("uvloop") else "asyncio"
+    http = "httptools" if _has_module("httptools") else "h11"
+    print(f"Starting AIONOS in production mode: {workers} worker(s), loop={loop}, http={http}")
+    share_snapshot(workers)
 
-if __name__ == "__main__":
     uvicorn.run(
         "api.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True  # Auto-reload on code changes
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=reload,
+        loop=loop,
+        http=http,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        limit_concurrency=args.limit_concurrency,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=False,
+        proxy_headers=True
     )
+
+
+if __name__ == "__main__":
+    main()
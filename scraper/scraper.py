@@ -1,27 +1,47 @@
 """
 Web scraper for AI history events.
 Scrapes Wikipedia and other sources for AI timeline data.
+
+Each source has a "type" naming the extractor that turns its page into
+events. Extractors register themselves with @register_extractor, so a
+new kind of source only needs a new extractor function, in this module
+or any other. Parser processes are sent the extractor's import path
+rather than the type, so they find it without sharing the registry.
 """
 import requests
 from bs4 import BeautifulSoup
+import importlib
 import re
 import json
+import multiprocessing
 import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from .sources import WIKIPEDIA_SOURCES, ESSENTIAL_EVENTS, CATEGORY_KEYWORDS
 
 # Directory for raw scraped data
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "raw")
 
+# Concurrent page downloads
+FETCH_THREADS = 8
+
+# Source type -> extractor(soup, url) returning events
+EXTRACTORS: Dict[str, Callable[[BeautifulSoup, str], List[Dict]]] = {}
+DEFAULT_SOURCE_TYPE = "timeline_table"
+
+
+class ScrapeError(Exception):
+    """A strict scrape could not fetch or extract every source."""
+
 
 def ensure_data_dir():
     """Create data directory if it doesn't exist."""
     os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def fetch_page(url: str) -> Optional[BeautifulSoup]:
-    """Fetch and parse a webpage."""
+def fetch_html(url: str) -> Optional[bytes]:
+    """Download a webpage without parsing it."""
     headers = {
         "User-Agent": "AIEvolutionAtlas/1.0 (Educational Project; https://github.com/example)"
     }
@@ -29,12 +49,44 @@ def fetch_page(url: str) -> Optional[BeautifulSoup]:
     try:
         response = requests.get(url, headers=headers, timeout=30)
         response.raise_for_status()
-        return BeautifulSoup(response.content, "html5lib")
+        return response.content
     except requests.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
 
 
+def fetch_page(url: str) -> Optional[BeautifulSoup]:
+    """Fetch and parse a webpage."""
+    html = fetch_html(url)
+    return BeautifulSoup(html, "html5lib") if html is not None else None
+
+
+def register_extractor(source_type: str):
+    """Decorator registering an extractor(soup, url) -> events for a source type."""
+    def decorator(func):
+        EXTRACTORS[source_type] = func
+        return func
+    return decorator
+
+
+def extractor_path(source_type: str) -> str:
+    """The "module:function" import path of the extractor registered for a source type."""
+    extractor = EXTRACTORS.get(source_type)
+    if extractor is None:
+        raise ValueError(f"No extractor registered for source type '{source_type}'")
+    return f"{extractor.__module__}:{extractor.__qualname__}"
+
+
+def extract_events(html: bytes, extractor: str, url: str) -> List[Dict]:
+    """
+    Parse a downloaded page and run an extractor given by its import path.
+    A plain function of picklable arguments, so it can run in a worker
+    process, which imports the extractor's module itself.
+    """
+    module, name = extractor.split(":")
+    return getattr(importlib.import_module(module), name)(BeautifulSoup(html, "html5lib"), url)
+
+
 def parse_year_from_text(text: str) -> Optional[int]:
     """Extract a year (1900-2030) from text."""
     match = re.search(r'\b(19\d{2}|20[0-2]\d)\b', text)
@@ -85,7 +137,12 @@ def scrape_wikipedia_timeline(url: str) -> List[Dict]:
     soup = fetch_page(url)
     if not soup:
         return []
-    
+    return extract_timeline_table(soup, url)
+
+
+@register_extractor("timeline_table")
+def extract_timeline_table(soup: BeautifulSoup, url: str) -> List[Dict]:
+    """Events from wikitable rows (year, ..., event) and dl/dt/dd year lists."""
     events = []
     
     # Look for tables with timeline data
@@ -157,15 +214,96 @@ def scrape_wikipedia_timeline(url: str) -> List[Dict]:
     return events
 
 
-def scrape_all_sources() -> List[Dict]:
-    """Scrape all configured Wikipedia sources."""
-    all_events = []
+@register_extractor("article")
+def extract_article(soup: BeautifulSoup, url: str) -> List[Dict]:
+    """Events from prose articles: one per sentence that names a year."""
+    content = soup.find("div", class_="mw-parser-output") or soup.body or soup
+    events = []
+    seen = set()
     
-    for source in WIKIPEDIA_SOURCES:
-        print(f"Scraping: {source['name']}...")
-        events = scrape_wikipedia_timeline(source['url'])
-        print(f"  Found {len(events)} events")
-        all_events.extend(events)
+    for paragraph in content.find_all("p"):
+        # Drop citation markers like [12]
+        text = re.sub(r'\[\d+\]', '', paragraph.get_text(" ", strip=True))
+        for sentence in re.split(r'(?<=[.!?])\s+', text):
+            year = parse_year_from_text(sentence)
+            if not year or len(sentence) < 40:
+                continue
+            
+            title = sentence.rstrip('.')
+            if len(title) > 150:
+                title = title[:147] + "..."
+            key = (year, title[:30].lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            events.append({
+                "year": year,
+                "title": title,
+                "description": sentence[:1000],
+                "category": guess_category(sentence),
+                "importance": guess_importance(sentence),
+                "source_url": url
+            })
+    
+    return events
+
+
+def scrape_all_sources(sources: List[Dict] = None, workers: int = None, strict: bool = False) -> List[Dict]:
+    """
+    Scrape all configured Wikipedia sources.
+    
+    Pages are downloaded concurrently in threads, and each one is parsed
+    and extracted in a process pool as soon as it arrives, so large
+    crawls use every core. Events come back in source order.
+    
+    A source that can't be fetched or extracted is left out; with
+    strict=True, ScrapeError is raised instead, so a partial result is
+    never mistaken for the full dataset.
+    """
+    sources = WIKIPEDIA_SOURCES if sources is None else sources
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    failed = []
+    
+    # spawn rather than fork: parser processes start while fetch threads are running
+    context = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(max_workers=FETCH_THREADS) as fetchers, \
+            ProcessPoolExecutor(max_workers=max(1, min(workers, len(sources))), mp_context=context) as parsers:
+        downloads = {}
+        for i, source in enumerate(sources):
+            source_type = source.get("type", DEFAULT_SOURCE_TYPE)
+            if source_type not in EXTRACTORS:
+                print(f"Skipping {source['name']}: no extractor for type '{source_type}'")
+                continue
+            print(f"Scraping: {source['name']}...")
+            downloads[fetchers.submit(fetch_html, source['url'])] = (i, extractor_path(source_type))
+        
+        extractions = {}
+        for download in as_completed(downloads):
+            i, extractor = downloads[download]
+            html = download.result()
+            if html is None:
+                failed.append(sources[i]['name'])
+            else:
+                extractions[parsers.submit(extract_events, html, extractor, sources[i]['url'])] = i
+        
+        for extraction in as_completed(extractions):
+            i = extractions[extraction]
+            try:
+                results[i] = extraction.result()
+            except Exception as e:
+                print(f"Error extracting {sources[i]['name']}: {e}")
+                failed.append(sources[i]['name'])
+    
+    if strict and failed:
+        raise ScrapeError(f"{len(failed)} of {len(sources)} sources failed: {', '.join(sorted(failed))}")
+    
+    all_events = []
+    for i, source in enumerate(sources):
+        if i in results:
+            print(f"  {source['name']}: found {len(results[i])} events")
+            all_events.extend(results[i])
     
     return all_events
 
@@ -218,12 +356,15 @@ def load_raw_data(filename: str = "scraped_events.json") -> List[Dict]:
         return json.load(f)
 
 
-def run_scraper(use_cache: bool = True) -> List[Dict]:
+def run_scraper(use_cache: bool = True, workers: int = None, strict: bool = False) -> List[Dict]:
     """
     Main scraper entry point.
     
     Args:
         use_cache: If True, skip scraping if data file exists
+        workers: Processes used for parsing (default: one per core)
+        strict: If True, raise ScrapeError rather than return a scrape
+            missing any source
     """
     cache_file = os.path.join(DATA_DIR, "scraped_events.json")
     
@@ -232,7 +373,7 @@ def run_scraper(use_cache: bool = True) -> List[Dict]:
         scraped = load_raw_data()
     else:
         print("Starting web scraper...")
-        scraped = scrape_all_sources()
+        scraped = scrape_all_sources(workers=workers, strict=strict)
         save_raw_data(scraped, "scraped_events.json")
     
     # Merge with essential events
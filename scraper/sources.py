@@ -4,6 +4,7 @@ Defines URLs and parsing rules for each source.
 """
 
 # Wikipedia pages with AI history - excellent sources
+# "type" picks the extractor registered in scraper.py (timeline_table, article)
 WIKIPEDIA_SOURCES = [
     {
         "name": "Timeline of AI",
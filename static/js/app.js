@@ -94,6 +94,18 @@ async function fetchStats() {
     }
 }
 
+async function fetchBootstrap() {
+    // Events, stats and categories for the initial view in one request
+    try {
+        const response = await fetch(`${API_BASE}/bootstrap`);
+        if (!response.ok) throw new Error('Failed to fetch bootstrap');
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching bootstrap:', error);
+        return null;
+    }
+}
+
 // ============================================
 // Rendering Functions
 // ============================================
@@ -195,6 +207,15 @@ function renderTimeline(events) {
     });
 }
 
+function hydrateTimeline(events) {
+    // The server already rendered the cards; only attach their handlers
+    const eventsById = new Map(events.map(event => [String(event.id), event]));
+    elements.timeline.querySelectorAll('.event-card').forEach(card => {
+        const event = eventsById.get(card.dataset.eventId);
+        if (event) card.addEventListener('click', () => openModal(event));
+    });
+}
+
 function renderStats(stats) {
     if (!stats) return;
 
@@ -313,6 +334,18 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+function readBootstrap() {
+    // Payload inlined by the server-rendered page, if any
+    const script = document.getElementById('bootstrap');
+    if (!script) return null;
+    try {
+        return JSON.parse(script.textContent);
+    } catch (error) {
+        console.error('Invalid bootstrap payload:', error);
+        return null;
+    }
+}
+
 function showLoading() {
     elements.loading.style.display = 'flex';
     elements.timeline.style.display = 'none';
@@ -344,6 +377,24 @@ async function loadStats() {
     renderStats(stats);
 }
 
+async function loadBootstrap() {
+    showLoading();
+
+    const data = await fetchBootstrap();
+    if (!data) {
+        // Fall back to the separate endpoints
+        await Promise.all([loadEvents(), loadStats()]);
+        return;
+    }
+
+    state.events = data.events || [];
+    state.stats = data.stats;
+
+    hideLoading();
+    renderTimeline(state.events);
+    renderStats(state.stats);
+}
+
 async function init() {
     // Load saved theme
     loadSavedTheme();
@@ -366,8 +417,15 @@ async function init() {
         if (e.key === 'Escape') closeModal();
     });
 
-    // Load data
-    await Promise.all([loadEvents(), loadStats()]);
+    // Load data: inlined in the server-rendered page, else one bootstrap request
+    const bootstrap = readBootstrap();
+    if (bootstrap) {
+        state.events = bootstrap.events || [];
+        state.stats = bootstrap.stats;
+        hydrateTimeline(state.events);
+    } else {
+        await loadBootstrap();
+    }
 
     console.log('🧠 AIONOS initialized');
 }
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The tests run against the in-memory demo dataset, never a real Supabase project
+os.environ.pop("SUPABASE_URL", None)
+os.environ.pop("SUPABASE_KEY", None)
+os.environ.pop("AIONOS_SNAPSHOT_PATH", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
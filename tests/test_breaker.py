@@ -0,0 +1,57 @@
+from api.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _cool_down(breaker: CircuitBreaker):
+    """Pretend reset_timeout has passed since the last state change."""
+    breaker._changed_at -= breaker.reset_timeout
+
+
+def test_opens_after_threshold_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_success_closes():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    _cool_down(breaker)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe goes out while it is pending
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        breaker.record_failure()
+    _cool_down(breaker)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_hung_probe_is_retried_after_another_cool_down():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    _cool_down(breaker)
+    assert breaker.allow()
+    _cool_down(breaker)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
@@ -0,0 +1,97 @@
+import pytest
+
+from api import database as db
+
+
+def _event(event_id, title=None):
+    return {"id": event_id, "year": 1950 + event_id, "title": title or f"Event {event_id}",
+            "category": "research", "importance": 3}
+
+
+@pytest.fixture
+def demo_store(monkeypatch):
+    """An empty demo store; tests load their own events with replace_demo_events."""
+    monkeypatch.setattr(db, "_demo_store", None)
+
+
+def _sync(since, limit):
+    """Follow get_changes() from since until has_more is false; (pages, last token)."""
+    pages = []
+    while True:
+        page = db.get_changes(since=since, limit=limit)
+        pages.append(([e["id"] for e in page["events"]], page["deleted"]))
+        since = page["next"]
+        if not page["has_more"]:
+            return pages, since
+
+
+def test_keyset_filter_without_nulls():
+    row = {"year": 2000, "month": 3, "day": 7, "id": 5}
+    assert db._keyset_filter(row) == ",".join([
+        "year.gt.2000",
+        "and(year.eq.2000,month.gt.3)",
+        "and(year.eq.2000,month.is.null)",
+        "and(year.eq.2000,month.eq.3,day.gt.7)",
+        "and(year.eq.2000,month.eq.3,day.is.null)",
+        "and(year.eq.2000,month.eq.3,day.eq.7,id.gt.5)",
+    ])
+
+
+def test_keyset_filter_with_null_day():
+    # NULL days sort last, so only later ids of the same NULL day follow
+    row = {"year": 2000, "month": 3, "day": None, "id": 5}
+    assert db._keyset_filter(row) == ",".join([
+        "year.gt.2000",
+        "and(year.eq.2000,month.gt.3)",
+        "and(year.eq.2000,month.is.null)",
+        "and(year.eq.2000,month.eq.3,day.is.null,id.gt.5)",
+    ])
+
+
+def test_keyset_filter_with_null_month_and_day():
+    row = {"year": 2000, "month": None, "day": None, "id": 5}
+    assert db._keyset_filter(row) == "year.gt.2000,and(year.eq.2000,month.is.null,day.is.null,id.gt.5)"
+
+
+def test_changes_pages_resume_where_they_stopped(demo_store):
+    db.replace_demo_events([_event(i) for i in range(1, 11)])
+    pages, token = _sync(None, limit=4)
+    assert pages == [([1, 2, 3, 4], []), ([5, 6, 7, 8], []), ([9, 10], [])]
+
+    # Nothing new: the token stays valid and returns an empty page
+    assert _sync(token, limit=4) == ([([], [])], token)
+
+    events = [_event(i) for i in range(1, 11) if i != 5]
+    events[2] = _event(3, "Event 3, revised")
+    db.replace_demo_events(events + [_event(11)])
+    pages, _ = _sync(token, limit=2)
+    # Changes come in version then id order, deletions included
+    assert pages == [([3], [5]), ([11], [])]
+
+
+def test_changes_rejects_a_malformed_token(demo_store):
+    db.replace_demo_events([_event(1)])
+    with pytest.raises(ValueError):
+        db.get_changes(since=db._encode_token({"v": "1", "p": 0}))
+
+
+def test_changes_rejects_a_token_from_reset_data(demo_store, monkeypatch):
+    db.replace_demo_events([_event(1), _event(2)])
+    token = db.get_changes()["next"]
+    # A restart without a snapshot starts the versions over, under another epoch
+    monkeypatch.setattr(db, "_demo_store", db._DemoStore(
+        [db.EventRecord.from_dict(_event(1))], epoch=db._PROCESS_EPOCH + 1
+    ))
+    with pytest.raises(ValueError, match="sync again"):
+        db.get_changes(since=token)
+    assert [e["id"] for e in db.get_changes()["events"]] == [1]
+
+
+def test_relevance_facets_count_the_ranked_matches(demo_store):
+    titles = ["Neural nets", "Network effects", "Neural network", "Expert systems"]
+    db.replace_demo_events([_event(i + 1, title) for i, title in enumerate(titles)])
+    events = db.get_all_events(search="neural network", rank="relevance")
+    facets = db.get_event_facets(search="neural network", rank="relevance")
+    assert len(events) == sum(facets["category"].values()) == 3
+    # Date order keeps the substring match
+    assert sum(db.get_event_facets(search="neural network")["category"].values()) == 1
@@ -0,0 +1,55 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from api import images
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/image.png")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "5")
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(self.headers["Host"].encode()[:5])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin(monkeypatch):
+    """An HttpOrigin whose host resolves to a local server once, then anywhere else (DNS rebinding)."""
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    answers = ["127.0.0.1"]
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        address = host if host == "127.0.0.1" else (answers.pop() if answers else "10.0.0.1")
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (address, port))]
+
+    monkeypatch.setattr(images.socket, "getaddrinfo", getaddrinfo)
+    monkeypatch.setattr(images, "_is_public", lambda address: address == "127.0.0.1")
+    yield images.HttpOrigin(), server.server_address[1]
+    server.shutdown()
+
+
+def test_fetch_connects_to_the_checked_address(origin):
+    origin, port = origin
+    data, validators = origin.fetch(f"http://img.test:{port}/image.png")
+    # The name was resolved once; the request still names the host
+    assert data == b"img.t"
+    assert validators["etag"] == '"v1"'
+
+
+def test_fetch_refuses_redirects(origin):
+    origin, port = origin
+    with pytest.raises(images.ImageError, match="redirects"):
+        origin.fetch(f"http://img.test:{port}/moved")
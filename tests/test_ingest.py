@@ -0,0 +1,38 @@
+import asyncio
+
+from api import ingest
+
+
+def _lines(chunks):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in ingest.iter_lines(source())]
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks_are_joined():
+    assert _lines([b'{"a":', b' 1}\n{"b"', b': 2}\n']) == [(1, b'{"a": 1}'), (2, b'{"b": 2}')]
+
+
+def test_last_line_without_newline_and_blank_lines():
+    assert _lines([b"one\n\n", b"  \nfour"]) == [(1, b"one"), (4, b"four")]
+
+
+def test_oversized_line_is_reported_once_and_skipped(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE_BYTES", 8)
+    # The long line arrives over several chunks, none holding its end
+    chunks = [b"ok\n", b"x" * 6, b"x" * 6, b"x" * 6, b"x\nafter\n"]
+    assert _lines(chunks) == [(1, b"ok"), (2, None), (3, b"after")]
+
+
+def test_oversized_line_within_one_chunk(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE_BYTES", 8)
+    assert _lines([b"first\n" + b"y" * 20 + b"\nlast"]) == [(1, b"first"), (2, None), (3, b"last")]
+
+
+def test_oversized_final_line(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE_BYTES", 8)
+    assert _lines([b"first\n", b"z" * 7, b"z" * 7]) == [(1, b"first"), (2, None)]
@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+
+from api.related import MIN_SIMILARITY, RelatedIndex
+from api.snapshot import EventSnapshot, write_snapshot
+
+WORDS = [f"term{i}" for i in range(40)]
+
+
+def _docs(count, first_id=1, seed=0):
+    rng = random.Random(seed)
+    return [
+        (first_id + i, " ".join(rng.sample(WORDS, 3)), " ".join(rng.sample(WORDS, 5)))
+        for i in range(count)
+    ]
+
+
+def _similarities(index: RelatedIndex) -> dict:
+    """Every pair's cosine similarity over the index's current vectors."""
+    similarities = (index.matrix @ index.matrix.T).toarray()
+    np.fill_diagonal(similarities, 0)
+    return {
+        event_id: dict(zip(index.ids, similarities[row])) for row, event_id in enumerate(index.ids)
+    }
+
+
+def _assert_top_k(index: RelatedIndex):
+    """Each list holds the k best neighbors a full rebuild would find (in any order among ties)."""
+    similarities = _similarities(index)
+    assert index.neighbors.keys() == similarities.keys()
+    for event_id, scores in similarities.items():
+        best = sorted((s for s in scores.values() if s >= MIN_SIMILARITY), reverse=True)[:index.k]
+        actual = index.neighbors[event_id]
+        assert np.allclose([s for _, s in actual], best, atol=1e-4), event_id
+        for neighbor, score in actual:
+            assert abs(scores[neighbor] - score) < 1e-4, (event_id, neighbor)
+
+
+def test_build_matches_brute_force():
+    index = RelatedIndex(_docs(80), k=5)
+    _assert_top_k(index)
+
+
+def test_add_matches_a_full_rebuild():
+    index = RelatedIndex(_docs(80), k=5)
+    # Added in two rounds, some with terms the index has not seen yet
+    index.add(_docs(15, first_id=81, seed=1))
+    new_terms = [(96 + i, f"novel{i} {WORDS[i]}", f"novel{i} fresh") for i in range(5)]
+    index.add(new_terms)
+    assert len(index.ids) == 100
+    _assert_top_k(index)
+
+
+def test_unknown_event_has_no_neighbors():
+    index = RelatedIndex(_docs(10), k=3)
+    assert index.related(999) is None
+    assert index.add([]) is None
+    assert index.related(1) == index.neighbors[1][:3]
+
+
+def test_index_over_snapshot_arrays_adds_like_one_built_in_memory(tmp_path):
+    path = str(tmp_path / "events.snapshot")
+    docs = _docs(80)
+    write_snapshot([{"id": i, "year": 2000, "title": t, "description": d, "category": "research"}
+                    for i, t, d in docs], path)
+    built = RelatedIndex(docs)
+    mapped = EventSnapshot(path).related_index()
+    for index in (built, mapped):
+        index.add(_docs(15, first_id=81, seed=1))
+        index.add([(96 + i, f"novel{i} {WORDS[i]}", f"novel{i} fresh") for i in range(5)])
+    for event_id in built.ids:
+        assert mapped.related(event_id) == built.related(event_id), event_id
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from api import singleflight
+from api.singleflight import Group
+
+FOLLOWERS = 4
+
+
+def _run_coalesced(monkeypatch, func):
+    """Start a leader and FOLLOWERS callers on one key; return each caller's outcome."""
+    joined = threading.Semaphore(0)
+    release = threading.Event()
+
+    def record(operation, leader):
+        if not leader:
+            joined.release()
+    monkeypatch.setattr(singleflight, "record_coalesce", record)
+
+    calls = []
+    group = Group("test")
+
+    def leader_func():
+        calls.append(1)
+        release.wait(5)
+        return func()
+
+    outcomes = [None] * (FOLLOWERS + 1)
+
+    def caller(i):
+        try:
+            outcomes[i] = ("result", group.do("key", leader_func))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(FOLLOWERS + 1)]
+    for thread in threads:
+        thread.start()
+    for _ in range(FOLLOWERS):
+        assert joined.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return calls, outcomes
+
+
+def test_concurrent_callers_share_one_result(monkeypatch):
+    result = object()
+    calls, outcomes = _run_coalesced(monkeypatch, lambda: result)
+    assert len(calls) == 1
+    assert all(outcome == ("result", result) for outcome in outcomes)
+
+
+def test_concurrent_callers_share_one_exception(monkeypatch):
+    error = RuntimeError("upstream down")
+
+    def fail():
+        raise error
+    calls, outcomes = _run_coalesced(monkeypatch, fail)
+    assert len(calls) == 1
+    assert all(kind == "error" and raised is error for kind, raised in outcomes)
+
+
+def test_finished_call_is_not_cached():
+    group = Group("test")
+    results = iter([1, 2])
+    assert group.do("key", lambda: next(results)) == 1
+    assert group.do("key", lambda: next(results)) == 2
+
+
+def test_failed_call_releases_its_key():
+    group = Group("test")
+
+    def fail():
+        raise ValueError("bad")
+    with pytest.raises(ValueError):
+        group.do("key", fail)
+    assert group.do("key", lambda: "ok") == "ok"
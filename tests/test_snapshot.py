@@ -0,0 +1,87 @@
+import pytest
+
+from api import database as db
+from api.snapshot import EventSnapshot, write_snapshot
+
+EVENTS = [
+    {"id": 1, "year": 1956, "month": 8, "title": "Dartmouth workshop", "category": "research",
+     "importance": 5, "description": "The field gets its name", "source_url": "https://example.org/d"},
+    {"id": 2, "year": 1997, "title": "Deep Blue beats Kasparov", "category": "milestone", "importance": 4},
+    {"id": 3, "year": 2017, "month": 6, "day": 12, "title": "Attention is all you need — Transformer",
+     "category": "research", "importance": 5, "description": "Self-attention replaces recurrence",
+     "image_url": "https://example.org/t.png"},
+    {"id": 4, "year": 1997, "month": 5, "title": "Long short-term memory", "category": "research",
+     "importance": 3, "description": "Recurrent networks that remember"},
+]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "events.snapshot")
+
+
+def _by_id(events):
+    return {e["id"]: e for e in events}
+
+
+def test_round_trip(path):
+    write_snapshot(EVENTS, path)
+    snapshot = EventSnapshot(path)
+
+    assert len(snapshot) == 4
+    assert snapshot.dataset_version == 1
+    for event in EVENTS:
+        assert snapshot.get(event["id"]) == event
+    assert snapshot.get(5) is None
+    # Timeline order, absent fields omitted
+    assert [e["id"] for e in snapshot.query()] == [1, 2, 4, 3]
+    assert snapshot.query(search="RECURRENT", year_from=1990) == [EVENTS[3]]
+    assert snapshot.query(category="research", importance=5, limit=1) == [EVENTS[0]]
+    assert snapshot.versions() == {1: 1, 2: 1, 3: 1, 4: 1}
+    assert snapshot.deleted() == {}
+
+
+def test_republish_carries_versions_and_deletions(path):
+    write_snapshot(EVENTS, path)
+    events = [dict(EVENTS[0], importance=4), EVENTS[1], EVENTS[3]]
+    write_snapshot(events, path)
+    write_snapshot(events + [{"id": 5, "year": 2022, "title": "ChatGPT", "category": "product"}], path)
+    snapshot = EventSnapshot(path)
+
+    assert snapshot.dataset_version == 3
+    assert snapshot.versions() == {1: 2, 2: 1, 4: 1, 5: 3}
+    assert snapshot.deleted() == {3: 2}
+    assert snapshot.get(3) is None
+    assert snapshot.get(1)["importance"] == 4
+    # The mapped change log resumes after a (version, id) position
+    assert snapshot.changes(0, 0, 10) == ([(1, 2, False), (1, 4, False), (2, 1, False), (2, 3, True),
+                                           (3, 5, False)], False)
+    assert snapshot.changes(1, 4, 2) == ([(2, 1, False), (2, 3, True)], True)
+
+
+def test_epoch_is_kept_until_written_from_scratch(path, tmp_path):
+    write_snapshot(EVENTS, path)
+    epoch = EventSnapshot(path).epoch
+    write_snapshot(EVENTS[:2], path)
+    assert EventSnapshot(path).epoch == epoch
+
+    other = str(tmp_path / "other.snapshot")
+    write_snapshot(EVENTS[:2], other)
+    assert EventSnapshot(other).dataset_version == 1
+    assert EventSnapshot(other).epoch != epoch
+
+
+def test_derived_sections_match_the_demo_store(path, monkeypatch):
+    write_snapshot(EVENTS, path)
+    snapshot = EventSnapshot(path)
+    # A store over the same rows in the same order, so ties break alike
+    monkeypatch.setattr(db, "_demo_store", None)
+    db.replace_demo_events(list(snapshot.rows()))
+    store = db._get_demo_store()
+
+    assert snapshot.search("attention memory", 10) == \
+        db._ranked_demo_events(store, None, None, None, None, "attention memory", 10)
+    assert snapshot.facets(importance=4) == db._demo_facets(store, None, 4, None, None, None)
+    assert snapshot.timeline(1950, 2029, 40, 2) == db.get_timeline(1950, 2029, 2, 2)["buckets"]
+    for event in EVENTS:
+        assert snapshot.related(event["id"]) == store.related_index.related(event["id"])